@@ -2,8 +2,8 @@
 # A* Implementation
 
 from FibonacciHeap import FibHeap   # for our Fibonacci heap, we will use Mike Pound's implementation
-from priority_queue import HeapPQ  # also from Dr. Pound
-from collections import deque
+from priority_queue import IndexedHeapPQ, BucketPQ, CountingPQ
+from compact import CompactMaze
 import maze
 
 
@@ -14,35 +14,40 @@ def get_distance(a: tuple, b: tuple) -> int:
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
 
-def a_star(to_solve: maze.Maze) -> list:
+def a_star(to_solve: maze.Maze, queue_type=IndexedHeapPQ, stats=None) -> list:
     """Uses the A* search algorithm (variant of Dijkstra's algorithm) to solve a maze, 'maze'.
     Note that due to the way some mazes are structured -- very dense mazes with short paths -- A* may not outperform
     a breadth-first search, and in fact may be almost identical in its operation with extra computational overhead.
-    However, this depends on the variety of maze supplied"""
+    However, this depends on the variety of maze supplied. 'queue_type' is the priority queue class to use (any of
+    those in priority_queue will do). If 'stats' (a stats.Stats) is given, the number of nodes expanded and the
+    operations made on the queue are added to it"""
+    if isinstance(to_solve, CompactMaze):
+        return _a_star_compact(to_solve, queue_type, stats)
 
     # get our start and end nodes
     start = to_solve.get_start()
     end = to_solve.get_end()
 
-    # we will use the start and end positions so frequently that it is worth having variables for them; calling a
-    # function is not free, so this trades off a little memory in exchange for a little better performance
-    start_pos = start.get_position()
+    # we will use the end position so frequently that it is worth having a variable for it; calling a function is not
+    # free, so this trades off a little memory in exchange for a little better performance
     end_pos = end.get_position()
 
-    # set up our "visited" dictionary, like we have for BFS and DFS
-    visited = {}
+    # set up our "visited" flags, indexed by node id, like we have for BFS and DFS
+    visited = to_solve.node_flags()
 
     # set up our priority queues
-    # the unvisited list will be a Heap Priority Queue; the nodes we want to visit will be ordered according to the
-    # heuristics we set for them -- get_distance from current node + Euclidian get_distance to end coordinate
-    unvisited = HeapPQ()    # we can use any priority queue, but I have found HeapPQ to be the fastest for this purpose
+    # the unvisited list will be a priority queue; the nodes we want to visit will be ordered according to the
+    # heuristics we set for them -- get_distance from current node + Euclidian get_distance to end coordinate. We can
+    # use any priority queue, but the indexed heap is the fastest, as it decreases keys in place (see pq_benchmark.py)
+    unvisited = queue_type() if stats is None else CountingPQ(queue_type())
 
     start_node = FibHeap.Node(0, start)
     unvisited.insert(start_node)    # we start with the start node unvisited
 
-    # we also need an object to equate nodes from the Maze object with nodes from the FibHeap object
-    node_index = {}
-    node_index[start_pos] = start_node
+    # we also need an object to equate nodes from the Maze object with nodes from the FibHeap object; like all of the
+    # state of the search, it is indexed by node id, and holds None for a node that isn't in the queue yet
+    node_index = to_solve.node_values(None)
+    node_index[start.id] = start_node
 
     # the distances of all nodes start at infinity, because we haven't visited them yet and we don't know what the
     # get_distance is given the best known path
@@ -52,8 +57,12 @@ def a_star(to_solve: maze.Maze) -> list:
     # we go. Note, however that this will NOT include the additional heuristic of the get_distance from the point to the
     # end position -- that information is included in the FibHeap node (we don't care about this additional heuristic
     # when we aren't adding new ones to the queue)
-    distances = {}    # the get_distance associated with S is 0
-    distances[start_pos] = 0
+    distances = to_solve.node_values(infinity)
+    distances[start.id] = 0    # the get_distance associated with S is 0
+
+    # the node each node was reached from on the best path known so far; this belongs to this search alone, so other
+    # threads may solve the same maze at the same time
+    parents = to_solve.node_values(None)
 
     # track the number of considered nodes and whether we have completed the maze
     node_count = 0
@@ -80,70 +89,152 @@ def a_star(to_solve: maze.Maze) -> list:
 
             for child in neighbors:
                 # if there is a neighbor at that position that we have not visited check it; otherwise, continue on
-                if child is not None and child.get_position() not in visited:
-                    # get the positions so we can calculate our distances
+                if child is not None and not visited[child.id]:
+                    # get the positions so we can calculate our distances, and the child's id to look up its state
                     parent_pos = current_pos
                     child_pos = child.get_position()
+                    child_id = child.id
 
                     # get the get_distance of parent to child
                     parent_to_child = get_distance(parent_pos, child_pos)
 
                     # we also want to know the get_distance to this child without our additional heuristic of the get
                     # distance to the end node -- just the get_distance to the parent plus parent_to_child
-                    path_length = distances[parent_pos] + parent_to_child
+                    path_length = distances[current.id] + parent_to_child
 
                     # get the get_distance of child to end -- this is our additional heuristic
                     remaining_distance = get_distance(child_pos, end_pos)
 
-                    # if we have a get_distance associated with the node, fetch it; otherwise, it's infinity
-                    if child_pos in distances:
-                        current_distance = distances[child_pos]
-                    else:
-                        current_distance = infinity
+                    # the get_distance associated with the node, which is infinity if we haven't reached it yet
+                    current_distance = distances[child_id]
 
                     # We will only update the get_distance if path length is less than the get_distance currently
                     # associated with this node's position -- if it's not, then the other path we have found to this
                     # node is shorter, and so we shouldn't make any changes in the path to that node
                     if path_length < current_distance:
                         # if we have a node for the child already, update it; otherwise, create a new node for the child
-                        if child_pos in node_index:
+                        if node_index[child_id] is not None:
                             # we want to decrease the get_distance heuristic of the child node; but first, we need to
                             # fetch the node from node_index, as decrease_key operates on a FibHeap.Node object
-                            to_decrease = node_index[child_pos]
+                            to_decrease = node_index[child_id]
                             # the key is the coordinate, the new value is the path length plus the extra heuristic
                             unvisited.decrease_key(to_decrease, path_length + remaining_distance)
 
                             # update the get_distance to this node as well -- we have found a shorter path; again, this
                             # does not include the additional heuristic
-                            distances[child_pos] = path_length
+                            distances[child_id] = path_length
 
                             # we also need to update the new parent node of that child
-                            child.parent = current
+                            parents[child_id] = current
                         # if we don't have a node for the child yet, create one
                         else:
                             # create a FibHeap node and add it to our priority queue
                             new_node = FibHeap.Node(path_length + remaining_distance, child)
-                            node_index[child_pos] = new_node
+                            node_index[child_id] = new_node
                             unvisited.insert(new_node)
 
                             # update the entry at the get_distance vector for the child and make sure we mark the
                             # current node as its previous node
-                            distances[child_pos] = path_length
-                            child.parent = current
+                            distances[child_id] = path_length
+                            parents[child_id] = current
 
-        # add this node to "visited" so we don't try to evaluate it again
-        visited[current_pos] = True
+        # mark this node as visited so we don't try to evaluate it again
+        visited[current.id] = 1
 
     # in the same manner as in in the BFS algorithm, construct the path by going back through the parent of each node,
     # starting at the end node and working backwards
     if completed:
-        path = deque()
-        current = end
-        while current is not None:
-            path.appendleft(current.get_position())     # has a complexity of O(1) at each end, so do this instead of
-            current = current.parent  # appending to a list and reversing it at the end
+        path = to_solve.get_path(parents)
     else:
         path = []
 
+    if stats is not None:
+        stats.count("nodes_expanded", node_count)
+        unvisited.record(stats)
+
     # we must return (bool)solved, (int)node_count, (list< tuple< int, int > >)path
     return completed, node_count, path
+
+
+def a_star_buckets(to_solve: maze.Maze, stats=None) -> list:
+    """A* with its open set in a bucket queue -- Dial's algorithm, with a heuristic. Every priority is a whole number
+    of pixels, so the nodes can be kept in one bucket per priority and never need to be compared. Finds paths of the
+    same length as a_star, although it may break ties between equally good nodes differently"""
+    return a_star(to_solve, BucketPQ, stats)
+
+
+class _NodeId(int):
+    """A node id that, like a Node, never compares as less than another. HeapPQ and QueuePQ compare (priority, node)
+    tuples, so this makes nodes with equal priorities leave those queues in exactly the same order as they do for a
+    Maze"""
+    __slots__ = ()
+
+    def __lt__(self, other):
+        return False
+
+
+def _a_star_compact(to_solve: CompactMaze, queue_type, stats=None) -> list:
+    """A* over a CompactMaze. This works just like the search over Node objects, except that the edge lengths are
+    read from the graph instead of being calculated, and all of the per-node state is kept in lists indexed by id"""
+    start = to_solve.get_start()
+    end = to_solve.get_end()
+
+    indptr = memoryview(to_solve.indptr)
+    indices = memoryview(to_solve.indices)
+    lengths = memoryview(to_solve.lengths)
+    xs = memoryview(to_solve.xs)
+    ys = memoryview(to_solve.ys)
+    end_x, end_y = xs[end], ys[end]
+
+    num_nodes = to_solve.get_num_nodes()
+    parents = [-1] * num_nodes
+    visited = bytearray(num_nodes)
+
+    # distances start out as None rather than infinity, as None tells us there is no heap node for the child yet
+    distances = [None] * num_nodes
+    distances[start] = 0
+    node_index = [None] * num_nodes
+
+    unvisited = queue_type() if stats is None else CountingPQ(queue_type())
+    start_node = FibHeap.Node(0, _NodeId(start))
+    unvisited.insert(start_node)
+    node_index[start] = start_node
+
+    node_count = 0
+    completed = False
+
+    while not completed and len(unvisited) > 0:
+        node_count += 1
+        current = unvisited.remove_minimum().value
+
+        if current == end:
+            completed = True
+        else:
+            for edge in range(indptr[current], indptr[current + 1]):
+                child = indices[edge]
+                if visited[child]:
+                    continue
+
+                path_length = distances[current] + lengths[edge]
+                current_distance = distances[child]
+
+                if current_distance is None or path_length < current_distance:
+                    priority = path_length + abs(xs[child] - end_x) + abs(ys[child] - end_y)
+                    if current_distance is None:
+                        new_node = FibHeap.Node(priority, _NodeId(child))
+                        node_index[child] = new_node
+                        unvisited.insert(new_node)
+                    else:
+                        unvisited.decrease_key(node_index[child], priority)
+
+                    distances[child] = path_length
+                    parents[child] = current
+
+        visited[current] = 1
+
+    if stats is not None:
+        stats.count("nodes_expanded", node_count)
+        unvisited.record(stats)
+
+    path = to_solve.get_path(parents) if completed else []
+    return completed, node_count, path
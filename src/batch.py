@@ -0,0 +1,120 @@
+# pymaze
+# Solve a whole directory of mazes across a pool of worker processes, writing one line of JSON per maze
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from registry import SOLVERS
+
+
+def find_images(pattern):
+    """Returns the image files named by 'pattern', which may be a directory (every file in it is used) or a glob"""
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+    else:
+        paths = glob.glob(pattern)
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+def solve_image(image_path, algorithm, graph, outdir):
+    """Loads, builds and solves a single maze, drawing the solution into 'outdir' if it isn't None. Returns a
+    dictionary describing the result, which is what we write out as JSON. This runs in the worker processes, so all of
+    the heavy imports happen here, once per worker rather than once per maze"""
+    from PIL import Image
+    from maze import Maze, native_image
+    from compact import CompactMaze
+    from draw_solution import draw_solution
+
+    result = {"image": image_path, "algorithm": algorithm}
+    timings = result["timings"] = {}
+    try:
+        t0 = time.perf_counter()
+        maze_image = native_image(Image.open(image_path))
+        maze_image.load()
+        t1 = time.perf_counter()
+        timings["load"] = t1 - t0
+
+        to_solve = CompactMaze(maze_image) if graph == "compact" else Maze(maze_image)
+        t2 = time.perf_counter()
+        timings["build"] = t2 - t1
+
+        solved, explored_count, path, timings["solve"] = SOLVERS[algorithm].solve(to_solve)
+        t3 = time.perf_counter()
+
+        result["nodes"] = to_solve.get_num_nodes()
+        result["solved"] = solved
+        result["explored"] = explored_count
+        result["path_nodes"] = len(path)
+
+        if solved and outdir is not None:
+            solution, total_distance = draw_solution(maze_image, path)
+            t4 = time.perf_counter()
+            timings["draw"] = t4 - t3
+
+            outfile = os.path.join(outdir, os.path.splitext(os.path.basename(image_path))[0] + ".png")
+            solution.save(outfile)
+            timings["save"] = time.perf_counter() - t4
+
+            result["path_length"] = total_distance
+            result["outfile"] = outfile
+        elif solved:
+            result["path_length"] = sum(abs(b[0] - a[0]) + abs(b[1] - a[1]) for a, b in zip(path, list(path)[1:]))
+
+    except Exception as e:
+        result["error"] = str(e)
+
+    return result
+
+
+def main(argv):
+    paths = find_images(argv.input)
+    if not paths:
+        print("No images found matching", argv.input, file=sys.stderr)
+        return 1
+
+    if argv.outdir is not None:
+        os.makedirs(argv.outdir, exist_ok=True)
+
+    output = open(argv.results, "w") if argv.results is not None else sys.stdout
+    failures = 0
+
+    t0 = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=argv.workers) as pool:
+            futures = [pool.submit(solve_image, path, argv.algorithm, argv.graph, argv.outdir) for path in paths]
+
+            # write each result as soon as it is ready, so a long batch can be followed as it runs
+            for future in as_completed(futures):
+                result = future.result()
+                if "error" in result:
+                    failures += 1
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - t0
+
+    print("Solved", len(paths), "mazes in", round(elapsed, 3), "seconds (" + str(round(len(paths) / elapsed, 2)),
+          "mazes per second,", failures, "errors)", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="mazesolve batch: solve every maze in a directory or glob")
+    parser.add_argument('input', help="A directory of maze images, or a glob pattern matching them")
+    parser.add_argument('-a', '--algorithm', help="The algorithm to solve each maze with", default="bfs",
+                        choices=list(SOLVERS))
+    parser.add_argument('-g', '--graph', help="The graph representation to solve", choices=["object", "compact"],
+                        default="object")
+    parser.add_argument('-w', '--workers', help="The number of worker processes; defaults to the number of CPUs",
+                        type=int, default=None)
+    parser.add_argument('-o', '--outdir', help="If given, draw each solution into this directory", default=None)
+    parser.add_argument('-r', '--results', help="Write the JSON lines to this file instead of standard output",
+                        default=None)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,200 @@
+# pymaze
+# Benchmark suite: time every phase of solving generated mazes of increasing size, and compare with a saved baseline
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from generate import generate
+
+# the sizes of maze we generate, in pixels square, and the kinds of maze
+SIZES = (100, 300, 1000, 3000, 10000)
+KINDS = ("perfect", "braid")
+
+# by default, a phase has regressed if it takes this much longer than in the baseline; timings shorter than
+# MIN_DIFFERENCE seconds apart are never regressions, as they are mostly noise
+TOLERANCE = 0.25
+MIN_DIFFERENCE = 0.01
+
+# where the generated mazes are kept by default: bench_mazes at the top of the repository, wherever we are run from
+MAZES = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "bench_mazes")
+
+
+def maze_image(directory, kind, size, seed):
+    """Returns the path of the generated maze, generating it first if it isn't already in 'directory'. Large mazes
+    take a while to generate, so they are kept between runs"""
+    path = os.path.join(directory, "{}-{}-{}.png".format(kind, size, seed))
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        generate(kind, size, seed).save(path)
+    return path
+
+
+def peak_memory():
+    """Returns the most memory this process has used so far, in bytes, or None if we can't tell"""
+    if resource is None:
+        return None
+    # Linux reports this in KiB, macOS in bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(path, algorithms, graph, repeat):
+    """Loads, builds, solves and draws the maze at 'path', 'repeat' times, and returns the best time for each phase
+    along with the peak memory after each one. This runs in a process of its own, so the peak is this maze's alone"""
+    from PIL import Image
+    from maze import Maze, native_image
+    from compact import CompactMaze
+    from lazy_maze import LazyMaze
+    from draw_solution import draw_solution
+    from registry import SOLVERS
+
+    graph_type = {"object": Maze, "compact": CompactMaze, "lazy": LazyMaze}[graph]
+    times = {}
+    memory = {}
+    result = {"times": times, "memory": memory, "path_lengths": {}}
+
+    def record(phase, elapsed):
+        times[phase] = min(times.get(phase, elapsed), elapsed)
+        memory[phase] = peak_memory()
+
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        maze_image = native_image(Image.open(path))
+        maze_image.load()
+        record("load", time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        to_solve = graph_type(maze_image)
+        record("build", time.perf_counter() - t0)
+
+        solution = None
+        for algorithm in algorithms:
+            solved, _, path_found, seconds = SOLVERS[algorithm].solve(to_solve)
+            record("solve:" + algorithm, seconds)
+            if solved:
+                solution = solution or path_found
+                path_found = list(path_found)
+                result["path_lengths"][algorithm] = sum(abs(b[0] - a[0]) + abs(b[1] - a[1])
+                                                        for a, b in zip(path_found, path_found[1:]))
+
+        # a lazy maze only knows how many nodes it has once the solvers have found them
+        result["nodes"] = to_solve.get_num_nodes()
+        del to_solve
+
+        if solution is not None:
+            t0 = time.perf_counter()
+            draw_solution(maze_image, solution)
+            record("draw", time.perf_counter() - t0)
+
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Compares 'results' with 'baseline' (in the format that main writes) and returns a list of messages, one for each
+    phase that got slower or used more memory by more than 'tolerance', and for each path that changed length"""
+    problems = []
+    for case, result in results["cases"].items():
+        old = baseline["cases"].get(case)
+        if old is None:
+            continue
+
+        for phase, elapsed in result["times"].items():
+            before = old["times"].get(phase)
+            if before is not None and elapsed > before * (1 + tolerance) and elapsed - before > MIN_DIFFERENCE:
+                problems.append("{} {}: {:.3f} s -> {:.3f} s (+{:.0%})".format(case, phase, before, elapsed,
+                                                                               elapsed / before - 1))
+
+        for phase, peak in result["memory"].items():
+            before = old["memory"].get(phase)
+            if before and peak and peak > before * (1 + tolerance):
+                problems.append("{} {} peak memory: {:.1f} MiB -> {:.1f} MiB".format(case, phase, before / 2 ** 20,
+                                                                                     peak / 2 ** 20))
+
+        for algorithm, length in result["path_lengths"].items():
+            before = old["path_lengths"].get(algorithm)
+            if before is not None and before != length:
+                problems.append("{} {}: path length changed from {} to {}".format(case, algorithm, before, length))
+
+    return problems
+
+
+def main(args):
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "graph": args.graph,
+        "seed": args.seed,
+        "cases": {},
+    }
+
+    # every case runs in a fresh process, so that the peak memory of one maze doesn't hide that of the next
+    context = multiprocessing.get_context("spawn")
+    for kind in args.kinds:
+        for size in args.sizes:
+            case = "{}-{}".format(kind, size)
+            path = maze_image(args.mazes, kind, size, args.seed)
+            with context.Pool(1) as pool:
+                result = pool.apply(run_case, (path, args.algorithms, args.graph, args.repeat))
+            results["cases"][case] = result
+
+            phases = ", ".join("{} {:.3f} s".format(phase, elapsed) for phase, elapsed in result["times"].items())
+            peak = max((peak for peak in result["memory"].values() if peak), default=None)
+            print(case + ":", result["nodes"], "nodes;", phases + ("; peak {:.1f} MiB".format(peak / 2 ** 20)
+                                                                  if peak else ""))
+            sys.stdout.flush()
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        problems = compare(results, baseline, args.tolerance)
+
+        print()
+        if problems:
+            print(len(problems), "regressions against", args.baseline + ":")
+            for problem in problems:
+                print("  " + problem)
+            return 1
+        print("No regressions against", args.baseline)
+
+    return 0
+
+
+if __name__ == "__main__":
+    from registry import SOLVERS
+
+    parser = argparse.ArgumentParser(description="Time the phases of solving generated mazes of several sizes, and "
+                                                 "compare the results with an earlier run")
+    parser.add_argument('-s', '--sizes', help="The sizes of maze to generate, in pixels square", type=int, nargs="+",
+                        default=list(SIZES))
+    parser.add_argument('-k', '--kinds', help="The kinds of maze to generate", choices=KINDS, nargs="+",
+                        default=list(KINDS))
+    parser.add_argument('-a', '--algorithms', help="The algorithms to time; the first one to solve each maze has its "
+                                                   "path drawn", choices=list(SOLVERS), nargs="+",
+                        default=["bfs", "a*", "dial", "bibfs"])
+    parser.add_argument('-g', '--graph', help="The graph representation to build", choices=["object", "compact", "lazy"],
+                        default="compact")
+    parser.add_argument('-r', '--repeat', help="How many times to run each maze; the best time for each phase is kept",
+                        type=int, default=3)
+    parser.add_argument('--seed', help="The seed for generating the mazes", type=int, default=0)
+    parser.add_argument('-m', '--mazes', help="The directory the generated mazes are kept in", default=MAZES)
+    parser.add_argument('-o', '--output', help="Write the results to this file as JSON, to use as a baseline later",
+                        default=None)
+    parser.add_argument('-b', '--baseline', help="Compare the results with this earlier output, and exit with status 1 "
+                                                 "if anything regressed", default=None)
+    parser.add_argument('-t', '--tolerance', help="How much slower (or larger), as a fraction, a phase may get before "
+                                                  "it counts as a regression", type=float, default=TOLERANCE)
+    sys.exit(main(parser.parse_args()))
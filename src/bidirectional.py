@@ -0,0 +1,212 @@
+# pymaze
+# Bidirectional BFS and A*: search from the start and the end at the same time, and stop where the searches meet
+
+from collections import deque
+import heapq
+import itertools
+import operator
+
+from a_star import get_distance
+from compact import CompactMaze
+
+
+def graph_access(to_solve):
+    """Returns three functions for walking either kind of graph: neighbors(node), which yields (neighbor, length) for
+    every neighbor of a node, position(node), which returns its coordinates, and node_id(node), which returns its id,
+    the index of its state in the arrays that to_solve.node_flags and to_solve.node_values return. Neighbors come in
+    the same order the other solvers use -- north, south, east, west"""
+    if isinstance(to_solve, CompactMaze):
+        indptr = memoryview(to_solve.indptr)
+        indices = memoryview(to_solve.indices)
+        lengths = memoryview(to_solve.lengths)
+        xs = memoryview(to_solve.xs)
+        ys = memoryview(to_solve.ys)
+
+        def neighbors(node):
+            first, last = indptr[node], indptr[node + 1]
+            return zip(indices[first:last], lengths[first:last])
+
+        def position(node):
+            return xs[node], ys[node]
+
+        # a node of a CompactMaze is its own id
+        node_id = operator.index
+    else:
+        def neighbors(node):
+            position = node.position
+            for child in node.neighbors.values():
+                if child is not None:
+                    yield child, get_distance(position, child.position)
+
+        def position(node):
+            return node.position
+
+        node_id = operator.attrgetter("id")
+
+    return neighbors, position, node_id
+
+
+def _join_paths(position, node_id, meeting, forward_parents, backward_parents):
+    """Builds the full path from the start to the end through 'meeting', the node where the two searches met.
+    'forward_parents' and 'backward_parents' are indexed by node id"""
+    path = deque()
+    current = meeting
+    while current is not None:
+        path.appendleft(position(current))
+        current = forward_parents[node_id(current)]
+
+    current = backward_parents[node_id(meeting)]
+    while current is not None:
+        path.append(position(current))
+        current = backward_parents[node_id(current)]
+    return path
+
+
+def bidirectional_bfs(to_solve, stats=None) -> list:
+    """Solves a maze with two breadth-first searches, one from the start and one from the end. Each step expands a
+    whole level of whichever search has the smaller frontier; once a level has reached a node the other search has
+    seen, the best of the meeting points found in that level gives a path with the fewest nodes, just like BFS.
+    Works on both a Maze and a CompactMaze. If 'stats' (a stats.Stats) is given, the number of nodes expanded and
+    reached by each search is added to it"""
+    start = to_solve.get_start()
+    end = to_solve.get_end()
+    neighbors, position, node_id = graph_access(to_solve)
+
+    # index 0 is the search from the start, index 1 the search from the end. For each node a search has reached, we
+    # keep the node it came from and how many steps it took, indexed by node id; a depth of -1 means not reached yet
+    parents = [to_solve.node_values(None), to_solve.node_values(None)]
+    depths = [to_solve.node_values(-1), to_solve.node_values(-1)]
+    depths[0][node_id(start)] = 0
+    depths[1][node_id(end)] = 0
+    reached = [1, 1]
+    frontiers = [[start], [end]]
+
+    node_count = 0
+    meeting = None
+
+    while frontiers[0] and frontiers[1] and meeting is None:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        my_parents, my_depths = parents[side], depths[side]
+        their_depths = depths[1 - side]
+
+        best = float("inf")
+        next_frontier = []
+        for current in frontiers[side]:
+            node_count += 1
+            depth = my_depths[node_id(current)] + 1
+
+            for child, _ in neighbors(current):
+                child_id = node_id(child)
+                if my_depths[child_id] < 0:
+                    my_parents[child_id] = current
+                    my_depths[child_id] = depth
+                    next_frontier.append(child)
+
+                    # if the other search has been here, we have a path; keep the shortest found in this level
+                    their_depth = their_depths[child_id]
+                    if their_depth >= 0 and depth + their_depth < best:
+                        best = depth + their_depth
+                        meeting = child
+
+        reached[side] += len(next_frontier)
+        frontiers[side] = next_frontier
+
+    if stats is not None:
+        stats.count("nodes_expanded", node_count)
+        stats.count("nodes_reached_forward", reached[0])
+        stats.count("nodes_reached_backward", reached[1])
+
+    if meeting is not None:
+        path = _join_paths(position, node_id, meeting, parents[0], parents[1])
+        return True, node_count, path
+    return False, node_count, []
+
+
+def bidirectional_a_star(to_solve, stats=None) -> list:
+    """Solves a maze with two A* searches, one from the start towards the end and one from the end towards the start,
+    always advancing the search with the smaller open set. Whenever a search reaches a node the other has reached, the
+    combined distance is a candidate path.
+
+    This is the "new bidirectional A*" of Pijls and Post: each search uses its own Manhattan heuristic, and a node is
+    only expanded if a path through it could still beat the best candidate -- judged both by its own priority and by
+    the lowest priority left in the other search. Nodes either search has taken out of its open set are never looked
+    at again by the other. Once either open set runs dry, the best candidate is a shortest path. Works on both a Maze
+    and a CompactMaze. If 'stats' (a stats.Stats) is given, the number of nodes expanded and the operations made on
+    the open sets are added to it"""
+    start = to_solve.get_start()
+    end = to_solve.get_end()
+    neighbors, position, node_id = graph_access(to_solve)
+
+    # as with the bidirectional BFS, index 0 is the search from the start and index 1 the search from the end, and
+    # every node's state is indexed by its id
+    infinity = float("inf")
+    targets = [position(end), position(start)]
+    distances = [to_solve.node_values(infinity), to_solve.node_values(infinity)]
+    distances[0][node_id(start)] = 0
+    distances[1][node_id(end)] = 0
+    parents = [to_solve.node_values(None), to_solve.node_values(None)]
+
+    # the nodes either search has finished with
+    removed = to_solve.node_flags()
+
+    # the open sets are plain heaps of (priority, tie breaker, node); rather than decreasing keys, we push a node again
+    # when we find a shorter path to it and skip the stale entry when it comes out
+    tie = itertools.count()
+    lowest = [get_distance(position(start), targets[0]), get_distance(position(end), targets[1])]
+    open_sets = [[(lowest[0], next(tie), start)], [(lowest[1], next(tie), end)]]
+
+    best = infinity
+    meeting = None
+    node_count = 0
+
+    while open_sets[0] and open_sets[1]:
+        side = 0 if len(open_sets[0]) <= len(open_sets[1]) else 1
+        my_distances, my_parents, my_open = distances[side], parents[side], open_sets[side]
+        their_distances = distances[1 - side]
+        target, other_target = targets[side], targets[1 - side]
+
+        _, _, current = heapq.heappop(my_open)
+        current_id = node_id(current)
+        if not removed[current_id]:
+            removed[current_id] = 1
+            node_count += 1
+
+            current_pos = position(current)
+            current_distance = my_distances[current_id]
+
+            # only expand the node if a path through it might still be shorter than the best one we have
+            if current_distance + get_distance(current_pos, target) < best and \
+                    current_distance + lowest[1 - side] - get_distance(current_pos, other_target) < best:
+                for child, length in neighbors(current):
+                    child_id = node_id(child)
+                    if removed[child_id]:
+                        continue
+
+                    path_length = current_distance + length
+                    if path_length < my_distances[child_id]:
+                        my_distances[child_id] = path_length
+                        my_parents[child_id] = current
+                        priority = path_length + get_distance(position(child), target)
+                        heapq.heappush(my_open, (priority, next(tie), child))
+
+                        # a node the other search hasn't reached is infinitely far away
+                        if path_length + their_distances[child_id] < best:
+                            best = path_length + their_distances[child_id]
+                            meeting = child
+
+        if my_open:
+            lowest[side] = my_open[0][0]
+
+    # every entry pushed has a number from 'tie'; those that were popped but not expanded were stale or finished with
+    if stats is not None:
+        pushes = next(tie)
+        pops = pushes - len(open_sets[0]) - len(open_sets[1])
+        stats.count("nodes_expanded", node_count)
+        stats.count("queue_inserts", pushes)
+        stats.count("queue_removals", pops)
+        stats.count("stale_entries_skipped", pops - node_count)
+
+    if meeting is not None:
+        path = _join_paths(position, node_id, meeting, parents[0], parents[1])
+        return True, node_count, path
+    return False, node_count, []
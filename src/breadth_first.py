@@ -2,18 +2,28 @@
 # Implementation of BFS
 
 from collections import deque
+from compact import CompactMaze
 import maze
 
-def breadth_first_search(to_solve: maze.Maze) -> list:
-    """Solves a maze (from Maze object 'maze') using a breadth-first search"""
+def breadth_first_search(to_solve: maze.Maze, stats=None) -> list:
+    """Solves a maze (from Maze object 'maze') using a breadth-first search. If 'stats' (a stats.Stats) is given, the
+    number of nodes expanded and queued is added to it"""
+    if isinstance(to_solve, CompactMaze):
+        return _breadth_first_search_compact(to_solve, stats)
+
     start = to_solve.get_start()
     end = to_solve.get_end()
 
     queue = deque([start])
 
-    # make sure we track which nodes have been visited so we don't get caught in a loop; use a dictionary for speed
-    visited = {}
-    visited[start.get_position()] = True
+    # make sure we track which nodes have been visited so we don't get caught in a loop; a flag for each node, indexed
+    # by its id, is both smaller and quicker to check than a dictionary keyed by position
+    visited = to_solve.node_flags()
+    visited[start.id] = 1
+
+    # the node each node was reached from, also indexed by id; this is kept here rather than on the nodes themselves,
+    # so that other threads can solve the same maze at the same time
+    parents = to_solve.node_values(None)
 
     node_count = 0
     completed = False
@@ -36,28 +46,66 @@ def breadth_first_search(to_solve: maze.Maze) -> list:
 
             # for every node that exists, update the node that came before it (the current node) and add it to the queue
             for node in neighbors:
-                if node is not None and node.get_position() not in visited:
+                if node is not None and not visited[node.id]:
                     # update the "parent" node of the child to point to "current"
-                    node.parent = current
+                    parents[node.id] = current
 
-                    # update the queue and the visited list
+                    # update the queue and the visited flags
                     queue.appendleft(node)
-                    visited[node.get_position()] = True
+                    visited[node.id] = 1
 
     # if we solved the maze, construct the path
     if completed:
-        # create an object for our path
-        path = deque()
-        current = end   # start at 'end' and work our way through the path backwards until we reach the start
-
-        # as long as we can retrieve a parent node, we haven't reached the start node
-        # the "parent" of the start node will never be updated by the algorithm, so it will always point to 'None'
-        while current is not None:
-            path.appendleft(current.get_position())     # add the node to the path
-            current = current.parent
+        # start at 'end' and work our way through the path backwards until we reach the start, which has no parent
+        path = to_solve.get_path(parents)
     else:
         path = []   # if we didn't solve the maze, there is no path
 
+    # every node we took off the queue was once put on it, so we can count both without slowing down the search
+    if stats is not None:
+        stats.count("nodes_expanded", node_count)
+        stats.count("nodes_queued", node_count + len(queue))
+
     # return a list of data about the search -- formatted as follows:
     # (bool)completed, (int)node_count, (list< tuple<int, int> >)path
     return completed, node_count, path
+
+
+def _breadth_first_search_compact(to_solve: CompactMaze, stats=None) -> list:
+    """The breadth-first search over a CompactMaze; it visits nodes in exactly the same order as the search over Node
+    objects does"""
+    start = to_solve.get_start()
+    end = to_solve.get_end()
+
+    # memoryviews let us index the graph's arrays without creating NumPy scalars for every lookup
+    indptr = memoryview(to_solve.indptr)
+    indices = memoryview(to_solve.indices)
+
+    # the parent of every node is stored by its id; -1 marks a node we haven't visited yet (and the start node)
+    parents = [-1] * to_solve.get_num_nodes()
+    visited = bytearray(to_solve.get_num_nodes())
+    visited[start] = 1
+
+    queue = deque([start])
+    node_count = 0
+    completed = False
+
+    while queue and not completed:
+        node_count += 1
+        current = queue.pop()
+
+        if current == end:
+            completed = True
+        else:
+            for child in indices[indptr[current]:indptr[current + 1]]:
+                if not visited[child]:
+                    parents[child] = current
+                    queue.appendleft(child)
+                    visited[child] = 1
+
+    if stats is not None:
+        stats.count("nodes_expanded", node_count)
+        stats.count("nodes_queued", node_count + len(queue))
+
+    path = to_solve.get_path(parents) if completed else []
+    return completed, node_count, path
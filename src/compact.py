@@ -0,0 +1,122 @@
+# pymaze
+# A compact, array-backed alternative to the Node-based maze graph
+
+from collections import deque
+
+from maze import HAS_NUMPY     # building the compact graph needs NumPy, which is only imported once we build one
+
+# direction codes for the edges of the compact graph; the edges of every node are stored in this order, which is the
+# same order the solvers check a Node's neighbors in
+NORTH, SOUTH, EAST, WEST = 0, 1, 2, 3
+
+
+class CompactMaze:
+    """Stores the same graph as Maze, but as flat arrays instead of Node objects. Nodes are identified by integer ids
+    in row-major order; their coordinates are in 'xs' and 'ys', and their edges are stored in CSR form (see
+    grid.adjacency). The solvers accept a CompactMaze anywhere they accept a Maze, and return the same kind of path"""
+
+    # the names of the arrays that make up the graph
+    ARRAYS = ("xs", "ys", "indptr", "indices", "lengths", "directions", "entrances", "exits")
+
+    def __init__(self, image):
+        if not HAS_NUMPY:
+            raise Exception("The compact graph requires NumPy.")
+
+        import grid
+        self._load_scan(grid.scan(*grid.image_to_grid(image)))
+
+    @classmethod
+    def from_scan(cls, result):
+        """Creates a CompactMaze from a maze that has already been scanned, such as by the streaming scan"""
+        graph = cls.__new__(cls)
+        graph._load_scan(result)
+        return graph
+
+    def _load_scan(self, result):
+        import grid
+        self.width, self.height = result.width, result.height
+        self.xs = result.xs.astype("int32")
+        self.ys = result.ys.astype("int32")
+        self.indptr, self.indices, self.lengths, self.directions = grid.adjacency(result)
+        self.entrances = result.entrances.astype("int64")
+        self.exits = result.exits.astype("int64")
+
+        self.start = result.start
+        self.end = result.end
+        self.num_nodes = result.num_nodes
+
+    @classmethod
+    def from_arrays(cls, width, height, start, end, arrays):
+        """Creates a CompactMaze from existing arrays, such as ones in shared memory, without scanning an image.
+        'arrays' maps each name in CompactMaze.ARRAYS to its array"""
+        graph = cls.__new__(cls)
+        graph.width, graph.height = width, height
+        for name in cls.ARRAYS:
+            setattr(graph, name, arrays[name])
+        graph.start = start
+        graph.end = end
+        graph.num_nodes = len(graph.xs)
+        return graph
+
+    def get_start(self):
+        return self.start
+
+    def get_end(self):
+        return self.end
+
+    def get_entrances(self):
+        """Returns the ids of every entrance -- the openings in the top row -- from left to right; the first is the
+        start"""
+        return self.entrances.tolist()
+
+    def get_exits(self):
+        """Returns the ids of every exit -- the openings in the bottom row -- from left to right; the first is the end"""
+        return self.exits.tolist()
+
+    def get_num_nodes(self):
+        return self.num_nodes
+
+    def get_dimensions(self):
+        return self.width, self.height
+
+    def get_position(self, node):
+        """Returns a tuple containing the position of node 'node'"""
+        return int(self.xs[node]), int(self.ys[node])
+
+    def node_flags(self):
+        """Returns a flag for every node, all of them clear, indexed by node id, just like Maze.node_flags"""
+        return bytearray(self.num_nodes)
+
+    def node_values(self, value):
+        """Returns a slot for every node, indexed by node id, each one holding 'value' to begin with, just like
+        Maze.node_values"""
+        return [value] * self.num_nodes
+
+    def get_path(self, parents):
+        """Constructs the path from the start to the end, as a deque of positions, by following 'parents' backwards
+        from the end node. The parent of the start node must be -1"""
+        xs = memoryview(self.xs)
+        ys = memoryview(self.ys)
+        path = deque()
+        current = self.end
+        while current != -1:
+            path.appendleft((xs[current], ys[current]))
+            current = parents[current]
+        return path
+
+    def array_layout(self, alignment=8):
+        """Lays the graph's arrays out one after another in a single block of memory, such as a shared memory block or a
+        file, with each array starting on a multiple of 'alignment' bytes. Returns a list of (name, array, offset) and
+        the total size of the block"""
+        layout = []
+        size = 0
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            layout.append((name, array, size))
+            size += -(-array.nbytes // alignment) * alignment
+        return layout, size
+
+    @property
+    def nbytes(self):
+        """The number of bytes used by the graph's arrays"""
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
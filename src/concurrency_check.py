@@ -0,0 +1,52 @@
+# pymaze
+# Stress test: solve one maze from many threads at once and make sure every result matches a serial run
+
+from maze import Maze
+from registry import SOLVERS
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import random
+import sys
+from PIL import Image
+
+def solve(to_solve, algorithm):
+    """Runs a solver and returns its result in a form that can be compared with '=='"""
+    completed, node_count, path, _ = SOLVERS[algorithm].solve(to_solve)
+    return completed, node_count, list(path)
+
+
+def check(to_solve, algorithms, threads, rounds, seed=0):
+    """Solves 'to_solve' with every algorithm serially, then 'rounds' more times with each algorithm, shuffled and
+    spread across 'threads' threads. Returns the number of results that differed from the serial ones"""
+    expected = {algorithm: solve(to_solve, algorithm) for algorithm in algorithms}
+
+    jobs = list(algorithms) * rounds
+    random.Random(seed).shuffle(jobs)
+
+    mismatches = 0
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for algorithm, result in zip(jobs, pool.map(lambda a: solve(to_solve, a), jobs)):
+            if result != expected[algorithm]:
+                print("Mismatch for", algorithm)
+                mismatches += 1
+
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve one maze from many threads at once and compare the results "
+                                                 "with serial runs")
+    parser.add_argument('-i', '--infile', help="The path to the image containing the maze", required=True)
+    parser.add_argument('-t', '--threads', help="The number of threads to solve with", type=int, default=8)
+    parser.add_argument('-r', '--rounds', help="How many times to run each algorithm", type=int, default=8)
+    parser.add_argument('-a', '--algorithms', help="The algorithms to run", choices=list(SOLVERS), nargs="+",
+                        default=["bfs", "dfs", "a*", "wall"])
+    args = parser.parse_args()
+
+    with Image.open(args.infile) as image:
+        maze = Maze(image)
+
+    failures = check(maze, args.algorithms, args.threads, args.rounds)
+    print(len(args.algorithms) * args.rounds, "concurrent solves,", failures, "mismatches")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,97 @@
+# pymaze
+# A quick check, straight from the pixels, of whether a maze can be solved at all, before any graph is built
+
+import numpy as np
+
+import grid
+
+
+class Regions:
+    """The separate regions of path in a maze: the pixels that can be reached from one another. 'sizes' holds the
+    number of pixels in each region, numbered in the order their first pixels come in the image, row by row; and
+    'entrances' and 'exits' hold the region each entrance and exit is in, from left to right, so that the start's is
+    first in 'entrances' and the end's first in 'exits'"""
+    def __init__(self, sizes, entrances, exits):
+        self.sizes = sizes
+        self.entrances = entrances
+        self.exits = exits
+
+    def solvable(self, any_opening=False) -> bool:
+        """Returns whether the end can be reached from the start or, with 'any_opening', whether any exit can be
+        reached from any entrance"""
+        if any_opening:
+            return not set(self.entrances).isdisjoint(self.exits)
+        return self.entrances[0] == self.exits[0]
+
+
+def regions(image):
+    """Labels the regions of path in 'image' and returns them as Regions, or None if the image isn't a maze we could
+    build -- it has pixels that are neither black nor white, or no start or end -- so that building it reports the
+    problem as usual. Path pixels are joined to those beside them just as the nodes of a Maze are, so two openings are
+    in the same region exactly when a solver can find a path between them; only the openings in the top and bottom
+    rows aren't joined to each other, as they only lead into the maze.
+    Rather than joining the pixels one by one, we join runs of path along each row: every run is joined to the runs it
+    touches in the rows above and below, and the runs are then merged with a union-find, done for every link at once"""
+    white, invalid, _ = grid.image_to_grid(image)
+    height, width = white.shape
+    if invalid.any():
+        return None
+
+    # the openings, found as the scan finds them; the end must have path above it
+    top = np.flatnonzero(white[0, 1:width - 1])
+    bottom = np.flatnonzero(white[-1, 1:width - 1])
+    if len(top) == 0 or len(bottom) == 0 or height < 2 or not white[-2, bottom[0] + 1]:
+        return None
+    start_x, end_x = int(top[0]) + 1, int(bottom[0]) + 1
+    entrance_xs = [start_x] + (grid.openings(white[0], white[1], start_x).tolist() if height > 2 else [])
+    exit_xs = [end_x] + (grid.openings(white[-1], white[-2], end_x).tolist() if height > 2 else [])
+
+    # a run starts at every path pixel without path to its west, and ends at every one without path to its east; in
+    # the top and bottom rows, every pixel is a run of its own. The runs are numbered in the order they start, and
+    # we find a pixel's run by looking up the last run to start at or before it
+    starts = white.copy()
+    starts[1:-1, 1:] &= ~white[1:-1, :-1]
+    ends = white.copy()
+    ends[1:-1, :-1] &= ~white[1:-1, 1:]
+    run_starts = np.flatnonzero(starts)
+    run_sizes = np.flatnonzero(ends) - run_starts + 1
+    runs = len(run_starts)
+
+    def run_of(pixels):
+        return np.searchsorted(run_starts, pixels, side="right") - 1
+
+    # every pair of path pixels one above the other joins their runs. Along a stretch of such pairs the runs only
+    # change where a run starts in either row, so we only need the pairs at the start of each stretch
+    below = white[:-1] & white[1:]
+    first = below.copy()
+    first[:, 1:] &= ~below[:, :-1] | starts[:-1, 1:] | starts[1:, 1:]
+    pairs = np.flatnonzero(first)
+    upper = run_of(pairs)
+    lower = run_of(pairs + width)
+
+    # union-find over the runs: each round, every root joined to a root with a lower number is hooked beneath the
+    # lowest such root, then every run is pointed straight at its new root. Links within a single tree are dropped, and
+    # the rest carried on between their roots, until none are left
+    parent = np.arange(runs)
+    while len(upper) > 0:
+        upper, lower = parent[upper], parent[lower]
+        apart = upper != lower
+        upper, lower = upper[apart], lower[apart]
+        if len(upper) == 0:
+            break
+        np.minimum.at(parent, np.maximum(upper, lower), np.minimum(upper, lower))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    # each tree's root is its lowest-numbered run, so numbering the roots in order numbers the regions by their first
+    # pixel
+    roots, region_of = np.unique(parent, return_inverse=True)
+    sizes = np.bincount(region_of, weights=run_sizes, minlength=len(roots)).astype(np.int64)
+
+    def region(x, y):
+        return int(region_of[run_of(y * width + x)])
+
+    return Regions(sizes.tolist(), [region(x, 0) for x in entrance_xs], [region(x, height - 1) for x in exit_xs])
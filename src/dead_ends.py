@@ -0,0 +1,151 @@
+# pymaze
+# Dead-end filling: paint over every dead-end corridor in the image before building the graph we solve
+
+import numpy as np
+
+import grid
+
+
+def _edge_ranges(indptr, nodes):
+    """Returns the ids of every edge leaving each node in 'nodes', given CSR offsets 'indptr'"""
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # for each edge, its offset from the start of its node's edges, plus that start
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+def dead_nodes(result, indptr, indices):
+    """Finds every node that lies on a dead end: repeatedly removes nodes with at most one neighbor left, never
+    removing an entrance or an exit, until there are none. What remains is the entrances and exits, every path between
+    them, and any loops. Returns a boolean array over the nodes of 'result'"""
+    degree = np.diff(indptr)
+    protected = np.zeros(result.num_nodes, dtype=bool)
+    protected[result.entrances] = True
+    protected[result.exits] = True
+
+    # the end must always have a node to its north, or the filled image won't scan; in a maze that can be solved, that
+    # node is on the path anyway, but if the end is cut off from the start it would otherwise be filled in
+    north, south = result.vertical
+    protected[north[south == result.end]] = True
+    removed = np.zeros(result.num_nodes, dtype=bool)
+
+    # every round removes the current tips of the dead ends, which makes their neighbors the tips of the next round
+    frontier = np.flatnonzero((degree <= 1) & ~protected)
+    while len(frontier) > 0:
+        removed[frontier] = True
+        neighbors = indices[_edge_ranges(indptr, frontier)]
+        candidates, counts = np.unique(neighbors[~removed[neighbors]], return_counts=True)
+        degree[candidates] -= counts
+        frontier = candidates[(degree[candidates] <= 1) & ~protected[candidates]]
+
+    return removed
+
+
+def fill_dead_ends(white, result):
+    """Fills in every dead end of the maze described by 'white' (see grid.image_to_grid), which has been scanned into
+    'result'. Filling a dead end pixel by pixel takes as many passes over the image as the longest dead end is long,
+    so instead we find the dead ends on the graph of the scan and then paint the pixels of every dead node, and of
+    the corridors leading to them, black in one go. Returns the filled copy of 'white' and the number of nodes that
+    were removed"""
+    indptr, indices, _, _ = grid.adjacency(result)
+    removed = dead_nodes(result, indptr, indices)
+    xs, ys = result.xs, result.ys
+
+    # mark the corridors between a dead node and each of its neighbors with +1 at the first pixel after the one end and
+    # -1 at the other end; a running sum along each row (or column) is then 1 exactly on the corridor pixels. Every node
+    # starts and ends at most one corridor in each direction, so no pixel is marked twice by the same assignment
+    height, width = white.shape
+    rows = np.zeros((height, width + 1), dtype=np.int8)
+    columns = np.zeros((height + 1, width), dtype=np.int8)
+
+    west, east = result.horizontal
+    dead = removed[west] | removed[east]
+    rows[ys[west[dead]], xs[west[dead]] + 1] += 1
+    rows[ys[east[dead]], xs[east[dead]]] -= 1
+
+    north, south = result.vertical
+    dead = removed[north] | removed[south]
+    columns[ys[north[dead]] + 1, xs[north[dead]]] += 1
+    columns[ys[south[dead]], xs[south[dead]]] -= 1
+
+    filled = white.copy()
+    filled &= np.cumsum(rows, axis=1, dtype=np.int8)[:, :width] == 0
+    filled &= np.cumsum(columns, axis=0, dtype=np.int8)[:height] == 0
+    filled[ys[removed], xs[removed]] = False
+
+    return filled, int(np.count_nonzero(removed))
+
+
+def scan_filled(image):
+    """Scans 'image' as grid.scan does, fills its dead ends, and scans what is left. Returns the result of the second
+    scan and the number of nodes the filling removed from the first"""
+    white, invalid, pixels = grid.image_to_grid(image)
+    filled, removed = fill_dead_ends(white, grid.scan(white, invalid, pixels))
+    return grid.scan(filled, invalid, pixels), removed
+
+
+def path_length(path):
+    """Returns the length of a path in pixels"""
+    path = list(path)
+    return sum(abs(x1 - x0) + abs(y1 - y0) for (x0, y0), (x1, y1) in zip(path, path[1:]))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from PIL import Image
+
+    from compact import CompactMaze
+    from maze import Maze, native_image
+    from registry import SOLVERS
+
+    parser = argparse.ArgumentParser(description="Measure how much filling in dead ends saves when building and "
+                                                 "solving a maze")
+    parser.add_argument('-i', '--infile', help="The path to the image containing the maze", required=True)
+    parser.add_argument('-g', '--graph', choices=["object", "compact"], default="object",
+                        help="The graph representation to build and solve")
+    parser.add_argument('-a', '--algorithms', help="The algorithms to run", choices=list(SOLVERS), nargs="+",
+                        default=["bfs", "a*"])
+    args = parser.parse_args()
+
+    graph_type = CompactMaze if args.graph == "compact" else Maze
+    maze_image = native_image(Image.open(args.infile))
+    maze_image.load()
+
+    # build and solve the maze as it is, then again with its dead ends filled in; the filled build includes the time
+    # taken to fill
+    timings = {}
+    nodes = {}
+    for filled in (False, True):
+        t0 = time.time()
+        if filled:
+            result, removed = scan_filled(maze_image)
+        else:
+            white, invalid, pixels = grid.image_to_grid(maze_image)
+            result = grid.scan(white, invalid, pixels)
+        to_solve = graph_type.from_scan(result)
+        timings[filled, "build"] = time.time() - t0
+
+        for algorithm in args.algorithms:
+            solved, explored_count, path, seconds = SOLVERS[algorithm].solve(to_solve)
+            timings[filled, algorithm] = seconds, explored_count, path_length(path) if solved else None
+
+        nodes[filled] = to_solve.get_num_nodes()
+        del to_solve
+
+    # filling also turns junctions into plain corridors, so the filled graph can lose more nodes than were filled
+    print("Dead-end filling removed", removed, "of", nodes[False], "nodes, leaving a graph of", nodes[True])
+    print("Build time:", round(timings[False, "build"], 3), "->", round(timings[True, "build"], 3),
+          "(saved", round(timings[False, "build"] - timings[True, "build"], 3), "seconds)")
+    for algorithm in args.algorithms:
+        (before, before_count, before_length), (after, after_count, after_length) = \
+            timings[False, algorithm], timings[True, algorithm]
+        print(SOLVERS[algorithm].label, "time:", round(before, 3), "->", round(after, 3),
+              "(saved", round(before - after, 3), "seconds; considered", before_count, "->", after_count, "nodes)")
+        if before_length != after_length:
+            print("  path length changed from", before_length, "to", after_length, "pixels")
@@ -2,19 +2,26 @@
 # Implementation of DFS
 
 from collections import deque
+from compact import CompactMaze
 import maze
 
 
-def depth_first_search(to_solve: maze.Maze) -> list:
-    """Run a depth-first search on the maze object"""
+def depth_first_search(to_solve: maze.Maze, stats=None) -> list:
+    """Run a depth-first search on the maze object. If 'stats' (a stats.Stats) is given, the number of nodes expanded
+    and pushed onto the stack is added to it"""
+    if isinstance(to_solve, CompactMaze):
+        return _depth_first_search_compact(to_solve, stats)
 
     # set up the function like the others; however, this algorithm will be more similar to BFS than to A*
     # we will get the start and end nodes and use dictionaries to fetch previous nodes and visited nodes
     start = to_solve.get_start()
     end = to_solve.get_end()
 
-    # like the other algorithms, use a dictionary to track which nodes have been visited
-    visited = {}
+    # like the other algorithms, keep a flag for each node, indexed by its id, to track which nodes have been visited
+    visited = to_solve.node_flags()
+
+    # the node each node was reached from, also indexed by id; like the visited flags, this belongs to this search alone
+    parents = to_solve.node_values(None)
 
     # while we used a queue for the breadth-first search, we will use a stack here (using deque). While we could use a
     # list for this purpose, a deque will give us better performance because a list might call realloc, while a deque
@@ -38,20 +45,58 @@ def depth_first_search(to_solve: maze.Maze) -> list:
 
             # iterate through each child node, making sure we only operate on valid nodes that haven't been visited
             for child in neighbors:
-                if child is not None and child.get_position() not in visited:
-                    child.parent = current
+                if child is not None and not visited[child.id]:
+                    parents[child.id] = current
                     fringe.append(child)
 
-        visited[current.get_position()] = True
+        visited[current.id] = 1
 
     # construct the path in the same manner as the other algorithms
     if completed:
-        path = deque()
-        current = end
-        while current is not None:
-            path.appendleft(current.get_position())
-            current = current.parent
+        path = to_solve.get_path(parents)
     else:
         path = []
 
+    # every node we popped was pushed once, although a node may be pushed more than once
+    if stats is not None:
+        stats.count("nodes_expanded", node_count)
+        stats.count("nodes_pushed", node_count + len(fringe))
+
+    return completed, node_count, path
+
+
+def _depth_first_search_compact(to_solve: CompactMaze, stats=None) -> list:
+    """The depth-first search over a CompactMaze, visiting nodes in the same order as the search over Node objects"""
+    start = to_solve.get_start()
+    end = to_solve.get_end()
+
+    indptr = memoryview(to_solve.indptr)
+    indices = memoryview(to_solve.indices)
+
+    parents = [-1] * to_solve.get_num_nodes()
+    visited = bytearray(to_solve.get_num_nodes())
+    fringe = deque([start])
+
+    completed = False
+    node_count = 0
+
+    while not completed and fringe:
+        node_count += 1
+        current = fringe.pop()
+
+        if current == end:
+            completed = True
+        else:
+            for child in indices[indptr[current]:indptr[current + 1]]:
+                if not visited[child]:
+                    parents[child] = current
+                    fringe.append(child)
+
+        visited[current] = 1
+
+    if stats is not None:
+        stats.count("nodes_expanded", node_count)
+        stats.count("nodes_pushed", node_count + len(fringe))
+
+    path = to_solve.get_path(parents) if completed else []
     return completed, node_count, path
@@ -1,7 +1,20 @@
+import itertools
+import sys
+
+from maze import HAS_NUMPY, SMALL_MAZE    # drawing whole segments at once needs NumPy, which is optional
+
+
 def draw_solution(image, path, color=None):
     """Given a maze file 'image', draws the solution indicated by 'path'. Returns the manipulated image. Further,
     calculates the total distance traversed by the path we are drawing.
-    We can specify the color of the line if we wish; this should be a tuple containing RGB values"""
+    We can specify the color of the line if we wish; this should be a tuple containing RGB values. An image that isn't
+    RGB, such as a 1-bit maze, is drawn on an RGB copy of itself, which is returned instead"""
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    # as with scanning, a small maze is quicker to draw a pixel at a time than to import NumPy for
+    if HAS_NUMPY and ("numpy" in sys.modules or image.size[0] * image.size[1] > SMALL_MAZE):
+        return _draw_segments(image, path, color)
 
     # use a variable for the path length so we don't need to call the len() function every time --
     # function calls are more expensive than load operations
@@ -35,3 +48,57 @@ def draw_solution(image, path, color=None):
                 image.putpixel((x, current[1]), px)
 
     return image, total_distance
+
+
+def _draw_segments(image, path, color=None):
+    """Draws exactly what draw_solution does, but works out every pixel of every segment at once with NumPy, then hands
+    all of the pixels of each color to PIL in a single call rather than setting them one at a time"""
+    import numpy as np
+    from PIL import ImageDraw
+
+    path_length = len(path)
+    if path_length < 2:
+        return image, 0
+
+    points = np.fromiter(itertools.chain.from_iterable(path), dtype=np.int64, count=2 * path_length).reshape(-1, 2)
+    current, peek = points[:-1], points[1:]
+    total_distance = int(np.abs(peek - current).sum())
+
+    # vertical segments include both of their ends, while horizontal ones leave out the end furthest to the east;
+    # segments that are neither aren't drawn at all
+    vertical = current[:, 0] == peek[:, 0]
+    horizontal = (current[:, 1] == peek[:, 1]) & ~vertical
+    low = np.minimum(current, peek)
+    counts = np.where(vertical, np.abs(peek[:, 1] - current[:, 1]) + 1,
+                      np.where(horizontal, np.abs(peek[:, 0] - current[:, 0]), 0))
+    total = int(counts.sum())
+    if total == 0:
+        return image, total_distance
+
+    # the pixels of every segment in turn, each one counting up from the segment's top or western end
+    segment = np.repeat(np.arange(path_length - 1), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    xs = np.where(vertical[segment], current[segment, 0], low[segment, 0] + offsets)
+    ys = np.where(vertical[segment], low[segment, 1] + offsets, current[segment, 1])
+
+    # where segments overlap, the one drawn last wins, so keep only the last occurrence of each pixel
+    width = image.size[0]
+    _, last = np.unique((ys * width + xs)[::-1], return_index=True)
+    keep = total - 1 - last
+    xs, ys, segment = xs[keep], ys[keep], segment[keep]
+
+    # the same gradient from blue to red, worked out with the same floating-point arithmetic; there are at most 256
+    # colors along it, so we draw the pixels of each color together
+    draw = ImageDraw.Draw(image)
+    if color is None:
+        shades = (segment / path_length * 255).astype(np.int64)
+        order = np.argsort(shades, kind="stable")
+        shades, xs, ys = shades[order], xs[order], ys[order]
+        boundaries = np.flatnonzero(np.diff(shades)) + 1
+        for first, last in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [len(shades)]))):
+            r = int(shades[first])
+            draw.point(np.column_stack((xs[first:last], ys[first:last])).ravel().tolist(), fill=(r, 0, 255 - r))
+    else:
+        draw.point(np.column_stack((xs, ys)).ravel().tolist(), fill=tuple(color))
+
+    return image, total_distance
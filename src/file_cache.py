@@ -0,0 +1,44 @@
+# pymaze
+# A directory of cache files, evicted least recently used first, and the content hash that identifies a maze image
+
+import hashlib
+import os
+
+
+def image_hash(path):
+    """Returns a hash of the contents of the file at 'path', which identifies the maze in the cache"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileCache:
+    """A directory of cache files with the same suffix, keyed by name. When the files take up more than 'max_bytes',
+    the least recently used ones are removed"""
+
+    SUFFIX = ""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def evict(self):
+        """Removes the least recently used files until the cache is no larger than max_bytes"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.SUFFIX):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
@@ -0,0 +1,128 @@
+# pymaze
+# Generate perfect and braided mazes of any size from a fixed seed, for testing and benchmarking
+
+import argparse
+import random
+
+import numpy as np
+from PIL import Image
+
+
+def perfect_maze(size, seed=0):
+    """Generates a perfect maze -- one with exactly one path between any two points -- about 'size' pixels square,
+    using a randomized depth-first search (the "recursive backtracker"). Every cell is a white pixel at odd
+    coordinates, and walls are knocked out between a cell and the next one the search moves to. The start is an
+    opening in the top row and the end an opening in the bottom row. Returns a boolean array, True for path; the same
+    'size' and 'seed' always give the same maze"""
+    rng = random.Random(seed)
+    cells = max(1, (size - 1) // 2)
+    width = 2 * cells + 1
+
+    # which cells the search has reached, and which pixels are open; the cells themselves are opened at the end
+    visited = bytearray(cells * cells)
+    white = bytearray(width * width)
+
+    first = rng.randrange(cells * cells)
+    visited[first] = 1
+    stack = [first]
+    while stack:
+        cell = stack[-1]
+        y, x = divmod(cell, cells)
+
+        # the unvisited neighbors of this cell, with the offset from this cell's pixel to the wall between them
+        options = []
+        if y > 0 and not visited[cell - cells]:
+            options.append((cell - cells, -width))
+        if y < cells - 1 and not visited[cell + cells]:
+            options.append((cell + cells, width))
+        if x > 0 and not visited[cell - 1]:
+            options.append((cell - 1, -1))
+        if x < cells - 1 and not visited[cell + 1]:
+            options.append((cell + 1, 1))
+
+        if not options:
+            stack.pop()
+            continue
+
+        following, wall = options[rng.randrange(len(options))] if len(options) > 1 else options[0]
+        white[(2 * y + 1) * width + 2 * x + 1 + wall] = 1
+        visited[following] = 1
+        stack.append(following)
+
+    maze = np.frombuffer(white, dtype=bool).reshape(width, width).copy()
+    maze[1::2, 1::2] = True
+
+    # the start and the end are above a random cell in the top row and below one in the bottom row
+    maze[0, 2 * rng.randrange(cells) + 1] = True
+    maze[-1, 2 * rng.randrange(cells) + 1] = True
+    return maze
+
+
+def braid(maze, fraction=1.0, seed=0):
+    """Removes dead ends from a maze made by perfect_maze, adding loops: each dead-end cell, with probability
+    'fraction', has one of its other walls knocked out, chosen at random. Modifies 'maze' in place and returns it"""
+    rng = np.random.default_rng(seed)
+    cells = maze[1:-1:2, 1:-1:2]
+    rows, columns = cells.shape
+
+    # the wall pixels around each cell; the walls on the outside of the maze may never be opened
+    walls = np.stack([maze[0:-2:2, 1:-1:2], maze[2::2, 1:-1:2], maze[1:-1:2, 0:-2:2], maze[1:-1:2, 2::2]])
+    inside = np.ones_like(walls)
+    inside[0, 0, :] = inside[1, -1, :] = inside[2, :, 0] = inside[3, :, -1] = False
+
+    dead_end = (walls.sum(axis=0) == 1) & (rng.random(cells.shape) < fraction)
+
+    # pick one of the closed walls on the inside at random by giving each a random score and taking the highest
+    scores = np.where(inside & ~walls, rng.random(walls.shape) + 1, 0)
+    choice = scores.argmax(axis=0)
+    dead_end &= scores.max(axis=0) > 0
+
+    ys, xs = np.nonzero(dead_end)
+    direction = choice[ys, xs]
+    dy = np.array([-1, 1, 0, 0])[direction]
+    dx = np.array([0, 0, -1, 1])[direction]
+    maze[2 * ys + 1 + dy, 2 * xs + 1 + dx] = True
+    return maze
+
+
+def add_gates(maze, gates, seed=0):
+    """Opens more entrances and exits in a maze made by perfect_maze, so that it has (up to) 'gates' of each: openings
+    above random cells of the top row and below random cells of the bottom row. Modifies 'maze' in place and returns
+    it"""
+    rng = random.Random(seed)
+    cells = maze.shape[1] // 2
+    for row in (0, -1):
+        closed = [2 * x + 1 for x in range(cells) if not maze[row, 2 * x + 1]]
+        for x in rng.sample(closed, min(gates - 1, len(closed))):
+            maze[row, x] = True
+    return maze
+
+
+def generate(kind, size, seed=0, gates=1):
+    """Returns a maze of the given kind ("perfect" or "braid") and size, with 'gates' entrances and exits, as a 1-bit
+    PIL image"""
+    maze = perfect_maze(size, seed)
+    if kind == "braid":
+        braid(maze, seed=seed)
+    elif kind != "perfect":
+        raise Exception("Unknown kind of maze: " + kind)
+    if gates > 1:
+        add_gates(maze, gates, seed)
+    return Image.fromarray(maze)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a maze image")
+    parser.add_argument('-o', '--outfile', help="The path of the maze image", required=True)
+    parser.add_argument('-t', '--type', help="The kind of maze: 'perfect' has exactly one path between any two points, "
+                                             "'braid' has its dead ends opened up into loops",
+                        choices=["perfect", "braid"], default="perfect")
+    parser.add_argument('-s', '--size', help="The width and height of the maze, in pixels; it is rounded down to an "
+                                             "odd number", type=int, default=1001)
+    parser.add_argument('--seed', help="The random seed; the same seed and size always give the same maze", type=int,
+                        default=0)
+    parser.add_argument('-g', '--gates', help="The number of entrances in the top row and exits in the bottom row",
+                        type=int, default=1)
+    args = parser.parse_args()
+
+    generate(args.type, args.size, args.seed, args.gates).save(args.outfile)
@@ -0,0 +1,93 @@
+# pymaze
+# A persistent cache of maze graphs, stored in a binary format that can be memory-mapped instead of rebuilt
+
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from compact import CompactMaze
+from file_cache import FileCache
+
+# every cache file starts with this; bump the version whenever the format or the graph itself changes
+MAGIC = b"PYMAZEG2"
+
+# the header is the magic, the length of the JSON metadata that follows it, and the metadata itself. The arrays start
+# at the next multiple of this many bytes
+HEADER = struct.Struct("<8sI")
+ALIGNMENT = 64
+
+
+def write_graph(path, graph: CompactMaze):
+    """Writes 'graph' to the file at 'path'. The file is written under a temporary name and then renamed, so readers
+    never see a partly-written graph"""
+    arrays, size = graph.array_layout(ALIGNMENT)
+    metadata = json.dumps({
+        "width": graph.width,
+        "height": graph.height,
+        "start": graph.start,
+        "end": graph.end,
+        "arrays": [(name, array.dtype.str, array.shape, offset) for name, array, offset in arrays],
+    }).encode()
+    header = HEADER.pack(MAGIC, len(metadata)) + metadata
+    data_start = -(-len(header) // ALIGNMENT) * ALIGNMENT
+
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            file.write(header.ljust(data_start, b"\0"))
+            for name, array, offset in arrays:
+                file.seek(data_start + offset)
+                file.write(np.ascontiguousarray(array).tobytes())
+            file.truncate(data_start + size)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def read_graph(path):
+    """Memory-maps the graph in the file at 'path' and returns it as a CompactMaze. Nothing is read from the arrays
+    until a solver touches them, so this is very cheap even for huge mazes"""
+    with open(path, "rb") as file:
+        magic, length = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("Not a graph cache file, or one from another version: " + path)
+        metadata = json.loads(file.read(length))
+    data_start = -(-(HEADER.size + length) // ALIGNMENT) * ALIGNMENT
+
+    arrays = {}
+    for name, dtype, shape, offset in metadata["arrays"]:
+        if shape[0] == 0:
+            # an empty array can't be memory-mapped
+            arrays[name] = np.empty(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=data_start + offset, shape=tuple(shape))
+
+    return CompactMaze.from_arrays(metadata["width"], metadata["height"], metadata["start"], metadata["end"], arrays)
+
+
+class GraphCache(FileCache):
+    """A directory of cached graphs, keyed by the hash of the image they came from. When the files in the directory
+    take up more than 'max_bytes', the least recently used ones are removed"""
+
+    SUFFIX = ".graph"
+
+    def load(self, key):
+        """Returns the cached graph for 'key' as a memory-mapped CompactMaze, or None if it isn't in the cache"""
+        path = self._path(key)
+        try:
+            graph = read_graph(path)
+        except (OSError, ValueError):
+            return None
+
+        # mark the file as recently used; the modification time is what eviction goes by
+        os.utime(path)
+        return graph
+
+    def store(self, key, graph: CompactMaze):
+        """Adds 'graph' to the cache under 'key', then evicts old graphs until the cache fits in its size bound"""
+        write_graph(self._path(key), graph)
+        self.evict()
@@ -0,0 +1,251 @@
+# pymaze
+# Vectorized scanning of maze images using NumPy
+
+import numpy as np
+
+
+class GridScan:
+    """The result of scanning a maze image. Nodes are identified by their index into the coordinate arrays; they are
+    stored in row-major order, so the entrances -- the openings in the top row, the start among them -- always come
+    first and the exits -- the openings in the bottom row, the first of which is the end -- always come last."""
+    def __init__(self, width, height, xs, ys, horizontal, vertical, entrances=None, exits=None):
+        self.width = width
+        self.height = height
+
+        # the coordinates of every node in the maze
+        self.xs = xs
+        self.ys = ys
+
+        # links between nodes, as two arrays of node indices each; for a horizontal link, the first array holds the
+        # western node and the second the eastern node, while for a vertical link it is the northern and southern
+        self.horizontal = horizontal
+        self.vertical = vertical
+
+        # the ids of the entrances and exits, from left to right; most mazes have just the one of each
+        self.entrances = np.array([0], dtype=np.intp) if entrances is None else entrances
+        self.exits = np.array([len(xs) - 1], dtype=np.intp) if exits is None else exits
+
+    @property
+    def num_nodes(self):
+        return len(self.xs)
+
+    @property
+    def start(self):
+        return int(self.entrances[0])
+
+    @property
+    def end(self):
+        return int(self.exits[0])
+
+
+class IndexedPixels:
+    """The pixels of a single-band image, along with the RGB color of each value they can hold. Indexing it at [y, x]
+    gives an RGB color, as it would for the pixels of an RGB image, so errors report the same values however the image
+    is stored"""
+    def __init__(self, values, colors):
+        self.values = values
+        self.colors = colors
+
+    def __getitem__(self, position):
+        return self.colors[int(self.values[position])]
+
+
+def image_to_grid(image):
+    """Converts an image into a pair of boolean arrays, 'white' and 'invalid', indexed by [y, x]. Pixels that are
+    neither pure white nor pure black are flagged as invalid; we don't raise here, as the scan only considers some of
+    them to be errors. Also returns the pixel data itself so that error messages can report the offending values.
+    1-bit, grayscale and palette images are read one byte per pixel, as they are, rather than converted to RGB: each of
+    the 256 values a pixel can hold is classified once, through its color, and the pixels are then looked up"""
+    from maze import band_colors
+
+    if image.mode == "1":
+        # a 1-bit image can only be black or white; NumPy gives us True for white
+        white = np.asarray(image)
+        return white, np.zeros_like(white), IndexedPixels(white, [(0, 0, 0), (255, 255, 255)])
+
+    if image.mode in ("L", "P"):
+        values = np.asarray(image)
+        colors = band_colors(image)
+        white_values = np.array([color == (255, 255, 255) for color in colors])
+        black_values = np.array([color == (0, 0, 0) for color in colors])
+        return white_values[values], ~(white_values | black_values)[values], IndexedPixels(values, colors)
+
+    pixels = np.asarray(image.convert("RGB") if image.mode != "RGB" else image)
+    white = np.all(pixels == 255, axis=2)
+    black = np.all(pixels == 0, axis=2)
+    return white, ~(white | black), pixels
+
+
+def _first(mask):
+    """Returns the first True position of 'mask' in row-major order as an (x, y) tuple, or None"""
+    flat = np.flatnonzero(mask)
+    if len(flat) == 0:
+        return None
+    y, x = divmod(int(flat[0]), mask.shape[1])
+    return x, y
+
+
+def _first_in_row(row, lo, hi):
+    """Returns the first True index in row[lo:hi], or None"""
+    hits = np.flatnonzero(row[lo:hi])
+    return None if len(hits) == 0 else lo + int(hits[0])
+
+
+def scan(white, invalid, pixels):
+    """Finds the nodes of the maze described by 'white' and the links between them. This mirrors the pixel-by-pixel
+    scan in Maze: the leftmost white pixel of the top row is the start, the leftmost white pixel of the bottom row is
+    the end, and every white pixel in between that is not part of a straight corridor is a node. Every other white
+    pixel of the top row with path below it is an entrance, and every other white pixel of the bottom row with path
+    above it is an exit. Errors are raised for the same pixel, with the same message, as the pixel-by-pixel scan would
+    raise them."""
+    from maze import MazeException
+
+    height, width = white.shape
+
+    def invalid_pixel(x, y, closing=")"):
+        message = "BMP image must be black and white (RGB values were " + str(tuple(int(v) for v in pixels[y, x]))
+        return MazeException(message + closing, (x, y))
+
+    # the start is the leftmost white pixel in the top row, ignoring the corners
+    start_x = _first_in_row(white[0], 1, width - 1)
+    bad_x = _first_in_row(invalid[0], 1, width - 1 if start_x is None else start_x)
+    if bad_x is not None:
+        raise invalid_pixel(bad_x, 0)
+    if start_x is None:
+        raise Exception("There must be a start point in the top row of the image.")
+    # a maze needs at least three rows to have more than one entrance or exit
+    entrance_xs = np.concatenate(([start_x], openings(white[0], white[1], start_x) if height > 2 else []))
+
+    # for every pixel in the rows between the first and last, look at its neighbors; pixels past the left and right
+    # edges of the image count as black
+    inner = white[1:-1]
+    north = white[:-2]
+    south = white[2:]
+    east = np.zeros_like(inner)
+    east[:, :-1] = inner[:, 1:]
+    west = np.zeros_like(inner)
+    west[:, 1:] = inner[:, :-1]
+
+    # a white pixel is a node unless it sits in a straight tunnel, running either north-south or east-west
+    vertical_tunnel = north & south & ~(east | west)
+    horizontal_tunnel = east & west & ~(north | south)
+    nodes = inner & ~vertical_tunnel & ~horizontal_tunnel
+
+    inner_ys, inner_xs = np.nonzero(nodes)
+    has_west = west[inner_ys, inner_xs]
+    has_north = north[inner_ys, inner_xs]
+    has_south = south[inner_ys, inner_xs]
+    inner_ys = inner_ys + 1
+
+    # find the bottom row's openings now so that we can put every node in a single, row-major list
+    end_x = _first_in_row(white[height - 1], 1, width - 1)
+    exit_xs = [] if end_x is None else np.concatenate(([end_x], openings(white[-1], white[-2], end_x)
+                                                       if height > 2 else []))
+
+    xs = np.concatenate((entrance_xs, inner_xs, exit_xs)).astype(np.intp)
+    ys = np.concatenate((np.zeros(len(entrance_xs)), inner_ys, np.full(len(exit_xs), height - 1))).astype(np.intp)
+    count = len(xs)
+    inner_ids = np.arange(len(entrance_xs), len(entrance_xs) + len(inner_xs))
+    first_exit = count - len(exit_xs)
+
+    # horizontal links: a node with path to its west is joined to the node before it in the same row
+    west_ids = inner_ids[has_west]
+    west_ok = ys[west_ids - 1] == ys[west_ids]
+    west_errors = west_ids[~west_ok]
+
+    # vertical links: a node with path to its north is joined to the nearest node above it in the same column, as long
+    # as that node has path to its south. The start may lead nowhere, but every other entrance and every exit has path
+    # below or above it
+    tail = np.ones(len(exit_xs), dtype=bool)
+    link_down = np.concatenate(([height > 1 and white[1, start_x]], np.ones(len(entrance_xs) - 1, dtype=bool),
+                                has_south, tail))
+    link_up = np.concatenate((np.zeros(len(entrance_xs), dtype=bool), has_north, tail))
+    by_column = np.lexsort((ys, xs))
+    above = np.full(count, -1, dtype=np.intp)
+    same_column = xs[by_column[1:]] == xs[by_column[:-1]]
+    above[by_column[1:][same_column]] = by_column[:-1][same_column]
+    north_ids = np.flatnonzero(link_up)
+    north_ok = above[north_ids] >= 0
+    north_ok[north_ok] = link_down[above[north_ids[north_ok]]]
+    north_errors = north_ids[~north_ok]
+
+    # the pixel scan stops at the first problem it comes across, so we must report whichever comes first. Invalid
+    # pixels in the middle rows are always errors; note the message is missing its closing parenthesis there
+    candidates = []
+    bad = _first(invalid[1:-1])
+    if bad is not None:
+        candidates.append(((bad[1] + 1, bad[0], 0), invalid_pixel(bad[0], bad[1] + 1, "")))
+    if len(west_errors) > 0:
+        i = int(west_errors[0])
+        candidates.append(((int(ys[i]), int(xs[i]), 0), MazeException("Expected node to the west; could not find one!",
+                                                                     (int(xs[i]), int(ys[i])))))
+    inner_north_errors = north_errors[north_errors < first_exit]
+    if len(inner_north_errors) > 0:
+        i = int(inner_north_errors[0])
+        candidates.append(((int(ys[i]), int(xs[i]), 1), MazeException("Expected node to the north; could not find one!",
+                                                                     (int(xs[i]), int(ys[i])))))
+    if candidates:
+        raise min(candidates, key=lambda c: c[0])[1]
+
+    # finally, the bottom row
+    bad_x = _first_in_row(invalid[height - 1], 1, width - 1 if end_x is None else end_x)
+    if bad_x is not None:
+        raise invalid_pixel(bad_x, height - 1)
+    if end_x is None:
+        raise Exception("There must be an endpoint on the bottom line of the image.")
+    if len(north_errors) > 0:
+        raise MazeException("No node found north of end position", (end_x, height - 1))
+
+    horizontal = (west_ids - 1, west_ids)
+    linked = north_ids
+    vertical = (above[linked], linked)
+
+    return GridScan(width, height, xs, ys, horizontal, vertical, np.arange(len(entrance_xs)),
+                    np.arange(first_exit, count))
+
+
+def openings(row, beside, first):
+    """Returns the x positions of the white pixels of 'row' (the top or bottom row of a maze) past the start or end at
+    'first', ignoring the corners, that have path in 'beside', the row next to it; these are the other entrances or
+    exits"""
+    return first + 1 + np.flatnonzero(row[first + 1:len(row) - 1] & beside[first + 1:len(row) - 1])
+
+
+def adjacency(result):
+    """Builds CSR-style adjacency for a scanned maze. The edges leaving node i are stored in
+    indices[indptr[i]:indptr[i + 1]], with the length of each edge in 'lengths' and the direction it leaves node i in
+    'directions'. Returns (indptr, indices, lengths, directions)"""
+    from compact import NORTH, SOUTH, EAST, WEST
+
+    west, east = result.horizontal
+    north, south = result.vertical
+    count = result.num_nodes
+
+    # a node has at most one edge in each direction, so we first fill in a table with a slot for each direction of
+    # every node. Reading the filled slots out in row-major order then gives us the edges already sorted by node and
+    # direction, without having to sort anything
+    index_type = np.int32 if count < 2 ** 31 else np.int64
+    table = np.full((count, 4), -1, dtype=index_type)
+    table[south, NORTH] = north
+    table[north, SOUTH] = south
+    table[east, WEST] = west
+    table[west, EAST] = east
+
+    # an edge is as long as the distance between the nodes along the row or column they share
+    vertical_lengths = (result.ys[south] - result.ys[north]).astype(np.int32)
+    horizontal_lengths = (result.xs[east] - result.xs[west]).astype(np.int32)
+    length_table = np.zeros((count, 4), dtype=np.int32)
+    length_table[south, NORTH] = vertical_lengths
+    length_table[north, SOUTH] = vertical_lengths
+    length_table[east, WEST] = horizontal_lengths
+    length_table[west, EAST] = horizontal_lengths
+
+    present = table >= 0
+    indptr = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.count_nonzero(present, axis=1), out=indptr[1:])
+
+    indices = table[present]
+    lengths = length_table[present]
+    directions = np.broadcast_to(np.arange(4, dtype=np.int8), (count, 4))[present]
+
+    return indptr, indices, lengths, directions
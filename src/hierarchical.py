@@ -0,0 +1,357 @@
+# pymaze
+# Hierarchical A* (HPA*): plan a route across clusters of the maze first, then find the path within only those clusters
+
+from collections import OrderedDict, deque
+import heapq
+import itertools
+import threading
+
+from a_star import get_distance
+from bidirectional import graph_access
+from queries import NodeIndex
+
+# the width and height of a cluster, in pixels. Larger clusters make the abstract graph smaller, so queries search
+# less of it, but each one has more portals and nodes, so building the hierarchy takes longer
+CLUSTER_SIZE = 32
+
+# how many hierarchies, each with its own cluster size, a maze keeps; beyond that, the least recently used is dropped
+HIERARCHY_CACHE_SIZE = 2
+
+# roughly how much memory the abstract graph takes for each portal and for each of its edges, as measured with
+# tracemalloc on the 2,000 pixel mazes in img
+PORTAL_BYTES = 150
+EDGE_BYTES = 75
+
+
+class Hierarchy:
+    """An abstraction of a maze for hierarchical path finding. The maze is split into square clusters of 'size' pixels;
+    a portal is a node with an edge to a node in another cluster. The abstract graph joins the portals by those edges,
+    and joins every pair of portals of the same cluster by the length of the shortest path between them that stays
+    within the cluster. Any path through the maze is a chain of such pieces, so a shortest path through the abstract
+    graph is as short as a shortest path through the maze; the cluster-by-cluster pieces of it are only found once it
+    is chosen.
+    Only the nodes that can be reached from an entrance or an exit are included. Building the hierarchy searches every
+    cluster once from each of its portals, which takes longer than solving the maze once, so it only pays off when it
+    is kept for many queries; see Hierarchies"""
+    def __init__(self, to_solve, size=CLUSTER_SIZE):
+        self.size = size
+        self.nodes = NodeIndex(to_solve)
+        self.neighbors, self.position, self.node_id = graph_access(to_solve)
+        self.columns = -(-to_solve.get_dimensions()[0] // size)
+
+        # the abstract graph: the edges leaving every portal, as (portal, length) pairs, and the portals of each cluster
+        self.edges = {}
+        self.portals = {}
+        self._join_portals(self._find_portals(to_solve))
+
+    def cluster(self, node):
+        """Returns the number of the cluster holding 'node'"""
+        x, y = self.position(node)
+        return (y // self.size) * self.columns + x // self.size
+
+    def _find_portals(self, to_solve):
+        """Walks every node that can be reached from the openings of the maze, and records the edges between clusters.
+        Returns the nodes of each cluster"""
+        neighbors, node_id, cluster, edges = self.neighbors, self.node_id, self.cluster, self.edges
+
+        # a flag for every node we have queued, indexed by id, as the other solvers keep them
+        seen = to_solve.node_flags()
+        queue = deque()
+        for opening in list(to_solve.get_entrances()) + list(to_solve.get_exits()):
+            if not seen[node_id(opening)]:
+                seen[node_id(opening)] = 1
+                queue.append(opening)
+
+        members = {}
+        while queue:
+            current = queue.popleft()
+            current_cluster = cluster(current)
+            members.setdefault(current_cluster, []).append(current)
+            for neighbor, length in neighbors(current):
+                if not seen[node_id(neighbor)]:
+                    seen[node_id(neighbor)] = 1
+                    queue.append(neighbor)
+                if cluster(neighbor) != current_cluster:
+                    edges.setdefault(current, []).append((neighbor, length))
+
+        for portal in edges:
+            self.portals.setdefault(cluster(portal), []).append(portal)
+        return members
+
+    def _join_portals(self, members):
+        """Joins each pair of portals in the same cluster by the shortest path between them within the cluster. Every
+        cluster is searched from each of its portals, so we first gather the edges within it, just while we do"""
+        neighbors = self.neighbors
+        for home, portals in self.portals.items():
+            if len(portals) < 2:
+                continue
+            nodes = set(members[home])
+            within = {node: [(neighbor, length) for neighbor, length in neighbors(node) if neighbor in nodes]
+                      for node in nodes}
+
+            for i, portal in enumerate(portals[:-1]):
+                others = portals[i + 1:]
+                distances, _, _ = self.search_cluster(portal, others, within.__getitem__)
+                for other in others:
+                    if other in distances:
+                        self.edges[portal].append((other, distances[other]))
+                        self.edges[other].append((portal, distances[other]))
+
+    def search_cluster(self, source, targets, within=None):
+        """Dijkstra's algorithm from 'source', over the nodes of its cluster alone, until every node in 'targets' has
+        been reached or there is nothing left to search. A search only touches one cluster, and there is one for every
+        portal, so its state is kept in dictionaries rather than in arrays over the whole maze. 'within', if given,
+        returns the (neighbor, length) pairs of a node of the cluster that lie within it; otherwise we look at every
+        neighbor's cluster as we go. Returns the distances and parents of the nodes it reached, and the number of nodes
+        it expanded"""
+        if within is None:
+            neighbors, cluster = self.neighbors, self.cluster
+            home = cluster(source)
+
+            def within(node):
+                return [(neighbor, length) for neighbor, length in neighbors(node) if cluster(neighbor) == home]
+
+        remaining = set(targets)
+        remaining.discard(source)
+        distances = {source: 0}
+        parents = {source: None}
+        done = set()
+        counter = itertools.count()
+        heap = [(0, next(counter), source)]
+        expanded = 0
+
+        while heap and remaining:
+            distance, _, current = heapq.heappop(heap)
+            if current in done:
+                continue
+            done.add(current)
+            remaining.discard(current)
+            expanded += 1
+
+            for neighbor, length in within(current):
+                new_distance = distance + length
+                if neighbor not in done and new_distance < distances.get(neighbor, new_distance + 1):
+                    distances[neighbor] = new_distance
+                    parents[neighbor] = current
+                    heapq.heappush(heap, (new_distance, next(counter), neighbor))
+
+        # anything we reached but didn't settle may not have its shortest distance yet
+        return {node: distances[node] for node in done}, parents, expanded
+
+    def find_path(self, source, target):
+        """Finds a shortest path from the node 'source' to the node 'target'. Returns whether there is one, the number
+        of nodes expanded -- in the abstract graph and in the clusters searched -- and the path as a deque of
+        positions, or an empty list if there is none"""
+        position, cluster = self.position, self.cluster
+        target_position = position(target)
+
+        # join the source to the portals of its cluster, and the portals of the target's cluster to the target. If
+        # the two share a cluster, there may be a path between them within it
+        source_edges, _, expanded = self._edges_within(source, [target])
+        target_edges, _, more = self._edges_within(target, [])
+        expanded += more
+        into_target = {}
+        for portal, length in target_edges:
+            if portal != target:
+                into_target[portal] = min(length, into_target.get(portal, length))
+
+        # A* over the abstract graph, with the same Manhattan distance heuristic as a_star. It only ever reaches the
+        # portals and the two ends, so, like the searches within a cluster, it keeps its state in dictionaries
+        counter = itertools.count()
+        distances = {source: 0}
+        parents = {source: None}
+        done = set()
+        heap = [(get_distance(position(source), target_position), next(counter), source)]
+        while heap:
+            _, _, current = heapq.heappop(heap)
+            if current in done:
+                continue
+            done.add(current)
+            expanded += 1
+            if current == target:
+                break
+
+            edges = source_edges if current == source else self.edges.get(current, [])
+            if current in into_target:
+                edges = itertools.chain(edges, [(target, into_target[current])])
+            for neighbor, length in edges:
+                new_distance = distances[current] + length
+                if neighbor not in done and new_distance < distances.get(neighbor, new_distance + 1):
+                    distances[neighbor] = new_distance
+                    parents[neighbor] = current
+                    heapq.heappush(heap, (new_distance + get_distance(position(neighbor), target_position),
+                                          next(counter), neighbor))
+        else:
+            return False, expanded, []
+
+        # the abstract path, from the source to the target
+        route = []
+        current = target
+        while current is not None:
+            route.append(current)
+            current = parents[current]
+        route.reverse()
+
+        # refine it: an edge between clusters is an edge of the maze, while between two nodes of the same cluster we
+        # search the cluster again for the path itself
+        path = deque([position(source)])
+        for first, second in zip(route, route[1:]):
+            if cluster(first) != cluster(second):
+                path.append(position(second))
+                continue
+            _, cluster_parents, more = self.search_cluster(first, [second])
+            expanded += more
+            piece = deque()
+            current = second
+            while current != first:
+                piece.appendleft(position(current))
+                current = cluster_parents[current]
+            path.extend(piece)
+
+        return True, expanded, path
+
+    @property
+    def nbytes(self):
+        """About how many bytes the abstract graph takes up in memory, not counting the index of nodes by position that
+        path_to builds the first time it is used"""
+        return len(self.edges) * PORTAL_BYTES + sum(len(edges) for edges in self.edges.values()) * EDGE_BYTES
+
+    def path_to(self, target, source=None):
+        """Returns the shortest path from position 'source' (the start, if None) to position 'target' as a deque of
+        positions, or None if there is no path. Both must be nodes of the maze"""
+        source = self.nodes.to_solve.get_start() if source is None else self.nodes.find(source)
+        solved, _, path = self.find_path(source, self.nodes.find(target))
+        return path if solved else None
+
+    def _edges_within(self, node, extra):
+        """Returns the abstract edges from 'node' to the portals of its own cluster (and to any of 'extra' in it), as
+        (node, length) pairs, along with the distances found and the number of nodes expanded finding them"""
+        home = self.cluster(node)
+        portals = self.portals.get(home, [])
+        targets = portals + [other for other in extra if self.cluster(other) == home]
+        distances, _, expanded = self.search_cluster(node, targets)
+        edges = [(other, distances[other]) for other in targets if other in distances and other != node]
+        return edges + self.edges.get(node, []), distances, expanded
+
+
+class Hierarchies:
+    """The hierarchies built for one maze, keyed by their cluster size, and kept in order of use so that the least
+    recently used can be dropped once there are more than 'capacity' of them. Like queries.PathTrees, the cache itself
+    is guarded by a lock, although two threads asking for the same missing hierarchy at the same time may both build
+    it"""
+    def __init__(self, to_solve, capacity=HIERARCHY_CACHE_SIZE):
+        self.to_solve = to_solve
+        self.capacity = capacity
+        self.built = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, size=CLUSTER_SIZE):
+        """Returns the hierarchy with clusters of 'size' pixels, building it if it isn't cached"""
+        with self.lock:
+            found = self.built.get(size)
+            if found is not None:
+                self.built.move_to_end(size)
+                return found
+
+        found = Hierarchy(self.to_solve, size)
+
+        with self.lock:
+            self.built[size] = found
+            self.built.move_to_end(size)
+            while len(self.built) > self.capacity:
+                self.built.popitem(last=False)
+        return found
+
+    def clear(self):
+        with self.lock:
+            self.built.clear()
+
+    @property
+    def nbytes(self):
+        """About how many bytes the cached hierarchies take up in memory"""
+        with self.lock:
+            return sum(found.nbytes for found in self.built.values())
+
+
+def hierarchies(to_solve):
+    """Returns the cache of hierarchies kept on 'to_solve', creating it the first time, just as queries.path_trees
+    keeps shortest-path trees. It lives as long as the maze does, and holds at most HIERARCHY_CACHE_SIZE hierarchies.
+    A graph without a __dict__ has nowhere to keep it, so it gets a new, empty cache every time"""
+    cache = getattr(to_solve, "_hierarchies", None)
+    if cache is None:
+        attributes = getattr(to_solve, "__dict__", None)
+        if attributes is None:
+            return Hierarchies(to_solve)
+        # setdefault makes sure that two threads getting here at once end up sharing one cache
+        cache = attributes.setdefault("_hierarchies", Hierarchies(to_solve))
+    return cache
+
+
+def hpa_star(to_solve, stats=None, size=CLUSTER_SIZE) -> list:
+    """Solves a maze with hierarchical A*, using the Hierarchy kept on the maze, and building it the first time.
+    Finds paths as short as a_star does, although it may break ties between equally short paths differently.
+    Building the Hierarchy takes longer than a_star takes to solve the maze, so the first solve is always slower; every
+    solve after it on the same maze only searches the abstract graph and the clusters the path passes through. Works
+    on a Maze, a CompactMaze and a LazyMaze. If 'stats' (a stats.Stats) is given, the number of nodes expanded by the
+    query is added to it"""
+    solved, expanded, path = hierarchies(to_solve).get(size).find_path(to_solve.get_start(), to_solve.get_end())
+    if stats is not None:
+        stats.count("nodes_expanded", expanded)
+    return solved, expanded, path
+
+
+def find_path(to_solve, target, source=None, size=CLUSTER_SIZE):
+    """Returns the shortest path from position 'source' (the start, if None) to position 'target' as a deque of
+    positions, or None if there is no path. Both must be nodes of the maze. Only the first query on a maze builds its
+    Hierarchy; every query after that uses the one kept on the maze"""
+    return hierarchies(to_solve).get(size).path_to(target, source)
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+
+    from PIL import Image
+    from maze import Maze, native_image
+    from compact import CompactMaze
+    from a_star import a_star
+
+    parser = argparse.ArgumentParser(description="Time hierarchical A* on a maze: building the hierarchy once, then "
+                                                 "solving the maze and answering path queries between random nodes")
+    parser.add_argument('-i', '--infile', help="The path to the image containing the maze", required=True)
+    parser.add_argument('-g', '--graph', choices=["object", "compact"], default="object",
+                        help="The graph representation to build")
+    parser.add_argument('-s', '--size', help="The width and height of a cluster, in pixels", type=int,
+                        default=CLUSTER_SIZE)
+    parser.add_argument('-r', '--random', help="Also find paths between this many pairs of nodes chosen at random",
+                        type=int, default=0)
+    parser.add_argument('--seed', help="The seed for choosing random nodes", type=int, default=0)
+    args = parser.parse_args()
+
+    maze_image = native_image(Image.open(args.infile))
+    to_solve = CompactMaze(maze_image) if args.graph == "compact" else Maze(maze_image)
+
+    t0 = time.perf_counter()
+    solved, explored_count, path = a_star(to_solve)
+    print("A*:", round(time.perf_counter() - t0, 3), "seconds, considered", explored_count, "nodes")
+
+    t0 = time.perf_counter()
+    built = hierarchies(to_solve).get(args.size)
+    print("Built the hierarchy in", round(time.perf_counter() - t0, 3), "seconds:", len(built.portals), "clusters with",
+          len(built.edges), "portals")
+
+    t0 = time.perf_counter()
+    solved, explored_count, path = hpa_star(to_solve, size=args.size)
+    print("HPA* with the hierarchy built:", round(time.perf_counter() - t0, 3), "seconds, considered", explored_count,
+          "nodes")
+
+    if args.random:
+        rng = random.Random(args.seed)
+        portals = list(built.edges)
+        pairs = [(rng.choice(portals), rng.choice(portals)) for _ in range(args.random)]
+        t0 = time.perf_counter()
+        found = sum(built.find_path(source, target)[0] for source, target in pairs)
+        t1 = time.perf_counter()
+        print("Found", found, "of", len(pairs), "paths between random portals in", round(t1 - t0, 3),
+              "seconds ({:.1f} ms per query)".format((t1 - t0) / len(pairs) * 1e3))
@@ -0,0 +1,214 @@
+# pymaze
+# A maze whose nodes are only found when a solver first asks for them
+
+from PIL import Image, ImageChops, ImageOps
+
+from maze import Maze, MazeException, Node, Direction, native_image, band_colors
+
+
+class LazyNode(Node):
+    """A Node whose neighbors aren't known until something asks for them. The first time 'neighbors' is read, the
+    maze follows each corridor leading away from the node to find them; after that, 'neighbors' is an ordinary
+    attribute, so the solvers pay nothing extra to use it"""
+    __slots__ = ("maze",)
+
+    def __init__(self, position, maze, node_id):
+        self.position = position
+        self.maze = maze
+        self.id = node_id
+
+    def __getattr__(self, name):
+        # this is only called when 'name' isn't found the normal way -- for a slot, when it hasn't been set yet -- so
+        # for 'neighbors', only the first time
+        if name != "neighbors":
+            raise AttributeError(name)
+        self.neighbors = self.maze.find_neighbors(self.position)
+        return self.neighbors
+
+
+class LazyMaze(Maze):
+    """A Maze that finds its nodes as it is solved rather than all at once. Only the entrances and exits are found up
+    front; every other node is found when a solver first looks at the neighbors of a node next to it, by walking along
+    the corridor between them in the image. A search that only explores part of the maze -- because the exit is near
+    the entrance, say -- only pays for that part. The nodes, their neighbors, and so the paths the solvers find, are
+    exactly the same as for a Maze.
+    Pixels are only checked when they are looked at, so an image that isn't black and white may go unnoticed, and
+    get_num_nodes returns the number of nodes found so far.
+    As we can't know how many nodes there will be, a node's id is the index of its pixel in the image rather than the
+    order it was found in; the flags the solvers keep take a byte for every pixel, and their other state is kept only
+    for the nodes they reach"""
+
+    def __init__(self, image):
+        image = native_image(image)
+        self.maze_file = image
+        self.colors = None if image.mode == "RGB" else band_colors(image)
+        self.width, self.height = image.size
+
+        # one byte per pixel, with a border of black around the image so we never have to check we're inside it
+        self.stride = self.width + 2
+        self.pixels = classify(image)
+
+        # every node found so far, by position. Solvers on other threads may be finding nodes at the same time, so
+        # nodes are only ever added with setdefault, which makes sure there is only ever one node for each position
+        self.nodes = {}
+
+        self.start_x = self._find_opening(0)
+        if self.start_x is None:
+            raise Exception("There must be a start point in the top row of the image.")
+        self.start = self._node(self.start_x, 0)
+
+        self.end_x = self._find_opening(self.height - 1)
+        if self.end_x is None:
+            raise Exception("There must be an endpoint on the bottom line of the image.")
+        if self._pixel(self.end_x, self.height - 2) != PATH:
+            raise MazeException("No node found north of end position", (self.end_x, self.height - 1))
+        self.end = self._node(self.end_x, self.height - 1)
+
+        # the other openings in the top row with path below them are entrances, and those in the bottom row with path
+        # above them are exits; a maze needs at least three rows to have any
+        self.entrances = [self.start]
+        self.exits = [self.end]
+        if self.height > 2:
+            for x in range(self.start_x + 1, self.width - 1):
+                if self.pixels[self._index(x, 0)] == PATH and self.pixels[self._index(x, 1)] == PATH:
+                    self.entrances.append(self._node(x, 0))
+            for x in range(self.end_x + 1, self.width - 1):
+                if self.pixels[self._index(x, self.height - 1)] == PATH and \
+                        self.pixels[self._index(x, self.height - 2)] == PATH:
+                    self.exits.append(self._node(x, self.height - 1))
+
+    def get_num_nodes(self):
+        return len(self.nodes)
+
+    def node_flags(self):
+        return bytearray(self.width * self.height)
+
+    def node_values(self, value):
+        return _NodeValues(value)
+
+    def _index(self, x, y):
+        return (y + 1) * self.stride + x + 1
+
+    def _pixel(self, x, y):
+        """Returns the kind of the pixel at (x, y), raising an exception if it is neither black nor white"""
+        kind = self.pixels[self._index(x, y)]
+        if kind == INVALID:
+            self._invalid(x, y)
+        return kind
+
+    def _invalid(self, x, y):
+        # the same error the scan in Maze gives, which leaves off the closing parenthesis in the middle rows
+        pixel = self.maze_file.getpixel((x, y))
+        if self.colors is not None:
+            pixel = self.colors[pixel]
+        message = "BMP image must be black and white (RGB values were " + str(pixel)
+        raise MazeException(message + ("" if 0 < y < self.height - 1 else ")"), (x, y))
+
+    def _find_opening(self, y):
+        """Returns the x position of the leftmost white pixel in row 'y', ignoring the corners, or None"""
+        for x in range(1, self.width - 1):
+            if self._pixel(x, y) == PATH:
+                return x
+        return None
+
+    def _node(self, x, y):
+        node = self.nodes.get((x, y))
+        if node is None:
+            node = self.nodes.setdefault((x, y), LazyNode((x, y), self, y * self.width + x))
+        return node
+
+    def find_neighbors(self, position):
+        """Returns the neighbors of the node at 'position', as a dictionary like Node.neighbors. For each direction
+        with path, we walk along the corridor until we reach a pixel that isn't part of it, which is the next node"""
+        pixels = self.pixels
+        stride = self.stride
+        origin_x, origin_y = position
+        origin = self._index(origin_x, origin_y)
+
+        # the indices of the first pixel past the top row, and the first pixel of the bottom row
+        top_end = 2 * stride
+        bottom_start = self.height * stride
+
+        neighbors = {}
+        for direction, step in ((Direction.NORTH, -stride), (Direction.SOUTH, stride), (Direction.EAST, 1),
+                                (Direction.WEST, -1)):
+            neighbors[direction] = None
+
+            # the start and the end only ever link to the node below and above them
+            if (origin < top_end or origin >= bottom_start) and (step == 1 or step == -1):
+                continue
+
+            i = origin + step
+            while True:
+                kind = pixels[i]
+                if kind != PATH:
+                    if kind == INVALID:
+                        self._invalid(i % stride - 1, i // stride - 1)
+                    break
+
+                if i < top_end or i >= bottom_start:
+                    # any opening in the top or bottom row that we reach from inside the maze is an entrance or an
+                    # exit, except in the corners. Reaching a corner of the top row is an error, while the corners of
+                    # the bottom row lead nowhere
+                    x = i % stride - 1
+                    if 0 < x < self.width - 1:
+                        neighbors[direction] = self._node(x, i // stride - 1)
+                    elif i < top_end:
+                        raise MazeException("Expected node to the north; could not find one!", position)
+                    break
+
+                # a pixel is part of a corridor if it only has path on opposite sides; otherwise, it is a node
+                north, south, east, west = pixels[i - stride], pixels[i + stride], pixels[i + 1], pixels[i - 1]
+                if (north | south | east | west) & INVALID:
+                    for j in (i - stride, i + stride, i + 1, i - 1):
+                        if pixels[j] == INVALID:
+                            self._invalid(j % stride - 1, j // stride - 1)
+                if not ((north and south and not (east or west)) or (east and west and not (north or south))):
+                    neighbors[direction] = self._node(i % stride - 1, i // stride - 1)
+                    break
+                i += step
+
+        return neighbors
+
+
+class _NodeValues(dict):
+    """The per-node state of a search over a LazyMaze, indexed by node id like the list Maze.node_values returns, but
+    only holding the nodes that have been given a value"""
+    def __init__(self, value):
+        super().__init__()
+        self.value = value
+
+    def __missing__(self, node_id):
+        return self.value
+
+
+# the kinds of pixel in LazyMaze.pixels
+WALL, PATH, INVALID = 0, 1, 2
+
+
+def classify(image):
+    """Returns the pixels of an image as bytes, one per pixel, holding WALL for black, PATH for white and INVALID for
+    anything else, with a border of WALL pixels all the way around. This is all done by PIL, so it is quick even for
+    huge images. A single-band image is mapped straight through a table built from the color of each value; for an RGB
+    image, each band maps black to 0, white to 1 and anything else to 4, so that their sum is 0 for black, 3 for white,
+    and anything else for any other color"""
+    if image.mode in ("1", "L", "P"):
+        table = [WALL if color == (0, 0, 0) else PATH if color == (255, 255, 255) else INVALID
+                 for color in band_colors(image)]
+        if image.mode == "1":
+            image = image.convert("L")
+        elif image.mode == "P":
+            # look at the palette indices as grayscale, so the result (and the border added to it) isn't a palette image
+            image = Image.frombytes("L", image.size, image.tobytes())
+        kinds = image.point(table)
+    else:
+        band_table = [4] * 256
+        band_table[0], band_table[255] = 0, 1
+        red, green, blue = (band.point(band_table) for band in image.split())
+        total = ImageChops.add(ImageChops.add(red, green), blue)
+
+        kind_table = [INVALID] * 256
+        kind_table[0], kind_table[3] = WALL, PATH
+        kinds = total.point(kind_table)
+
+    return ImageOps.expand(kinds, border=1, fill=WALL).tobytes()
@@ -1,7 +1,21 @@
 # pymaze
 # Contains the object to contain our mazes
 
+from collections import deque
+from contextlib import contextmanager
 from enum import Enum
+import gc
+from importlib.util import find_spec
+import sys
+
+# the vectorized scan needs NumPy, which is optional. It is only imported once an image is scanned, so that the
+# programs that never scan one -- with a lazy maze, say -- start up without it
+HAS_NUMPY = find_spec("numpy") is not None
+
+# importing NumPy takes longer than scanning a maze of up to about this many pixels one pixel at a time, so unless it
+# has been imported already, mazes this small are scanned without it
+SMALL_MAZE = 100 * 100
+
 
 class Direction(Enum):
     """ An enumerated type for the direction we are traveling
@@ -23,18 +37,30 @@ class Direction(Enum):
             return "West"
 
 
+_NO_NEIGHBORS = {Direction.NORTH: None, Direction.SOUTH: None, Direction.EAST: None, Direction.WEST: None}
+
+
 class Node:
     """Node objects for our Maze"""
-    def __init__(self, position):
+
+    # a maze may have millions of nodes, and without a __dict__ for its attributes each one takes far less memory
+    __slots__ = ("position", "neighbors", "id")
+
+    def __init__(self, position, node_id):
         # All nodes have a position in the graph
         self.position = position
 
-        # Each node can have, at most, 4 neighbors -- a north, south, east, and west neighbor
-        self.neighbors = {Direction.NORTH: None, Direction.SOUTH: None, Direction.EAST: None, Direction.WEST: None}
+        # and a number of their own, from 0 up to the number of nodes in the maze, given to them in the order they are
+        # created. The solvers keep their state in flat arrays indexed by it, rather than in dictionaries keyed by
+        # position, which would need to hash a tuple every time a node is looked at
+        self.id = node_id
+
+        # Each node can have, at most, 4 neighbors -- a north, south, east, and west neighbor. Copying a template is
+        # much cheaper than building the dictionary from scratch, as it doesn't need to hash the keys again
+        self.neighbors = _NO_NEIGHBORS.copy()
 
-        # we must also track the parent node of the nodes we visit when we are solving the maze so we can construct
-        # the path to the end
-        self.parent = None
+        # note that nodes don't store any of the state used to solve the maze, such as the node we reached them from;
+        # the solvers keep that themselves, so a single Maze can be solved by many threads at once
 
     def __str__(self):
         return "Node { " + str(self.position) + "}"
@@ -51,6 +77,45 @@ class Node:
         return self.neighbors[direction] is not None
 
 
+@contextmanager
+def _gc_paused():
+    """Switches off the cyclic garbage collector for the duration of the block. When we allocate millions of nodes,
+    none of which are garbage, the collector would only waste time walking them over and over"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+# the image modes a maze can be read from as they are: 1-bit, 8-bit grayscale, palette and RGB. A 1-bit maze takes a
+# twenty-fourth of the memory of the same maze converted to RGB, and is quicker to load and to scan
+NATIVE_MODES = ("1", "L", "P", "RGB")
+
+
+def native_image(image):
+    """Returns 'image' itself if a maze can be read from it as it is, and a copy converted to RGB otherwise"""
+    return image if image.mode in NATIVE_MODES else image.convert("RGB")
+
+
+def band_colors(image):
+    """Returns the RGB color of each of the 256 values a pixel of a single-band image can hold: for a palette image, the
+    palette entries, with black past the end of the palette just as when PIL converts it to RGB; for grayscale and
+    1-bit images (whose pixels are 0 or 255), the gray of that value"""
+    if image.mode == "P":
+        palette = image.getpalette("RGB") or []
+        palette += [0] * (768 - len(palette))
+        return [tuple(palette[i:i + 3]) for i in range(0, 768, 3)]
+    return [(value, value, value) for value in range(256)]
+
+
+def _rgb(pixel):
+    """Returns a pixel read from an image as an RGB tuple, so errors report the same values whatever the image mode"""
+    return pixel if isinstance(pixel, tuple) else (pixel, pixel, pixel)
+
+
 class MazeException(Exception):
     """Exceptions generated in the maze will use this exception"""
     def __init__(self, message, position):
@@ -66,16 +131,31 @@ class MazeException(Exception):
 class Maze:
     """An object to store maze data"""
 
-    # Some static methods to test whether a pixel is white or black
+    # Some static methods to test whether a pixel is white or black; pixels of 1-bit and grayscale images are single
+    # values rather than RGB tuples
     @staticmethod
     def is_white(pixel):
-        return pixel == (255, 255, 255)
+        return pixel == 255 or pixel == (255, 255, 255)
 
     @staticmethod
     def is_black(pixel):
-        return pixel == (0, 0, 0)
+        return pixel == 0 or pixel == (0, 0, 0)
+
+    def __init__(self, image, vectorized=None):
+        # use the vectorized scan if we can, unless the maze is so small that importing NumPy would take longer than
+        # scanning it without
+        if vectorized is None:
+            vectorized = "numpy" in sys.modules or image.size[0] * image.size[1] > SMALL_MAZE
+        vectorized = vectorized and HAS_NUMPY
+
+        # the vectorized scan reads every native mode as it is. Reading pixels one at a time, a palette image's pixels
+        # are palette indices rather than colors, so it is converted to RGB, and a 1-bit image to grayscale, as its
+        # white pixels may hold any value but 0 until it is converted
+        if image.mode not in NATIVE_MODES or (image.mode == "P" and not vectorized):
+            image = image.convert("RGB")
+        elif image.mode == "1" and not vectorized:
+            image = image.convert("L")
 
-    def __init__(self, image):
         # open the maze file and operate through it, finding black and white squares
         self.maze_file = image
         # make sure we keep track of the maze width and height
@@ -88,6 +168,50 @@ class Maze:
         # track the number of nodes
         self.num_nodes = 0
 
+        # the vectorized scan is much faster, but requires NumPy; fall back to reading pixels one at a time without it
+        if vectorized:
+            import grid
+            self._build_from_scan(grid.scan(*grid.image_to_grid(image)))
+        else:
+            self._scan_pixels()
+
+    @classmethod
+    def from_scan(cls, result):
+        """Creates a Maze from a maze that has already been scanned, such as by the streaming scan, rather than from
+        an image"""
+        to_solve = cls.__new__(cls)
+        to_solve.maze_file = None
+        to_solve.width, to_solve.height = result.width, result.height
+        to_solve._build_from_scan(result)
+        return to_solve
+
+    def _build_from_scan(self, result):
+        """Creates the Node objects for a maze that has been scanned by grid.scan"""
+        with _gc_paused():
+            self._link_nodes(result)
+
+    def _link_nodes(self, result):
+        positions = zip(result.xs.tolist(), result.ys.tolist())
+        nodes = [Node(position, i) for i, position in enumerate(positions)]
+
+        # hoist the directions into locals; looking them up on the enum for every link adds up on large mazes
+        north_dir, east_dir, south_dir, west_dir = Direction.NORTH, Direction.EAST, Direction.SOUTH, Direction.WEST
+
+        for west, east in zip(result.horizontal[0].tolist(), result.horizontal[1].tolist()):
+            nodes[west].neighbors[east_dir] = nodes[east]
+            nodes[east].neighbors[west_dir] = nodes[west]
+
+        for north, south in zip(result.vertical[0].tolist(), result.vertical[1].tolist()):
+            nodes[north].neighbors[south_dir] = nodes[south]
+            nodes[south].neighbors[north_dir] = nodes[north]
+
+        self.start = nodes[result.start]
+        self.end = nodes[result.end]
+        self.entrances = [nodes[i] for i in result.entrances.tolist()]
+        self.exits = [nodes[i] for i in result.exits.tolist()]
+        self.num_nodes = result.num_nodes
+
+    def _scan_pixels(self):
         """Get the nodes in the maze and create Node objects for them. They are accessed by using the start and end
         nodes, depending on how you are traversing the maze."""
 
@@ -105,7 +229,7 @@ class Maze:
             px = self.maze_file.getpixel((x, y))
 
             if self.is_white(px):   # if the pixel is white
-                self.start = Node((x, y))
+                self.start = Node((x, y), self.num_nodes)
                 top_nodes[x] = self.start   # make sure we add the start node to top_nodes so that the next node down
                 # has a northern neighbor
                 self.num_nodes += 1
@@ -114,13 +238,22 @@ class Maze:
                 x += 1
             else:
                 # if it's not white or black, raise an exception -- it must be black/white
-                message = "BMP image must be black and white (RGB values were " + str(px) + ")"
+                message = "BMP image must be black and white (RGB values were " + str(_rgb(px)) + ")"
                 raise MazeException(message, (x, y))
 
         # ensure there is a start node on the top line -- if self.start is None, we didn't find one
         if self.start is None:
             raise Exception("There must be a start point in the top row of the image.")
 
+        # every other white pixel in the top row with path below it is another entrance to the maze
+        self.entrances = [self.start]
+        if self.height > 2:
+            for x in range(x + 1, self.width - 1):
+                if self.is_white(self.maze_file.getpixel((x, 0))) and self.is_white(self.maze_file.getpixel((x, 1))):
+                    top_nodes[x] = Node((x, 0), self.num_nodes)
+                    self.entrances.append(top_nodes[x])
+                    self.num_nodes += 1
+
         # iterate over every pixel in the image _except_ the first and last rows
         for y in range(1, self.height - 1):
             # left_node must be set to None at the start of every row
@@ -161,7 +294,7 @@ class Maze:
                         continue
                     else:
                         # first, create the new node
-                        new_node = Node((x, y))
+                        new_node = Node((x, y), self.num_nodes)
 
                         # next, check for neighbors
                         # if the west neighbor is white, we must have a node in that direction; it's in left_node
@@ -199,7 +332,7 @@ class Maze:
 
                 # if we find a color other than black or white, it's an error
                 else:
-                    message = "BMP image must be black and white (RGB values were " + str(px)
+                    message = "BMP image must be black and white (RGB values were " + str(_rgb(px))
                     raise MazeException(message, (x, y))
 
         # iterate over the last row of pixels
@@ -210,7 +343,7 @@ class Maze:
 
             if self.is_white(px):
                 # create the end node if we find a white pixel
-                end_node = Node((x, y))
+                end_node = Node((x, y), self.num_nodes)
 
                 # the node to the end must be above it
                 if top_nodes[x] is not None:
@@ -226,21 +359,63 @@ class Maze:
                 x += 1
             else:
                 # if it's not white or black, raise an exception -- it must be black/white
-                message = "BMP image must be black and white (RGB values were " + str(px) + ")"
+                message = "BMP image must be black and white (RGB values were " + str(_rgb(px)) + ")"
                 raise MazeException(message, (x, y))
 
         # make sure we have an end node
         if self.end is None:
             raise Exception("There must be an endpoint on the bottom line of the image.")
 
+        # and every other white pixel in the bottom row with a node above it is another exit
+        self.exits = [self.end]
+        if self.height > 2:
+            for x in range(x + 1, self.width - 1):
+                if self.is_white(self.maze_file.getpixel((x, y))) and top_nodes[x] is not None:
+                    exit_node = Node((x, y), self.num_nodes)
+                    top_nodes[x].neighbors[Direction.SOUTH] = exit_node
+                    exit_node.neighbors[Direction.NORTH] = top_nodes[x]
+                    self.exits.append(exit_node)
+                    self.num_nodes += 1
+
     def get_start(self):
         return self.start
 
     def get_end(self):
         return self.end
 
+    def get_entrances(self):
+        """Returns every entrance to the maze -- the openings in its top row -- from left to right; the first is the
+        start"""
+        return self.entrances
+
+    def get_exits(self):
+        """Returns every exit from the maze -- the openings in its bottom row -- from left to right; the first is the
+        end. Openings in the left and right columns are neither exits nor entrances, just dead ends"""
+        return self.exits
+
     def get_num_nodes(self):
         return self.num_nodes
 
     def get_dimensions(self):
         return self.width, self.height
+
+    def node_flags(self):
+        """Returns a flag for every node, all of them clear, indexed by node id; solvers use these to mark the nodes
+        they have visited"""
+        return bytearray(self.num_nodes)
+
+    def node_values(self, value):
+        """Returns a slot for every node, indexed by node id, each one holding 'value' to begin with; solvers keep the
+        parents and distances of the nodes in these"""
+        return [value] * self.num_nodes
+
+    def get_path(self, parents):
+        """Constructs the path from the start to the end, as a deque of positions, by following 'parents' backwards from
+        the end node. 'parents' is indexed by node id (see node_values) and holds the Node each node was reached from;
+        the start node's is None"""
+        path = deque()
+        current = self.end
+        while current is not None:
+            path.appendleft(current.get_position())     # has a complexity of O(1) at each end, so do this instead of
+            current = parents[current.id]   # appending to a list and reversing it at the end
+        return path
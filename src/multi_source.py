@@ -0,0 +1,164 @@
+# pymaze
+# Multi-source BFS and A*: find the best path from any entrance of a maze to any exit in a single search
+
+from bisect import bisect_left
+from collections import deque
+import heapq
+import itertools
+
+from a_star import get_distance
+from bidirectional import graph_access
+
+
+def _endpoints(to_solve, sources, targets):
+    """Returns the nodes to search from and to, which are the entrances and exits of the maze unless given"""
+    sources = to_solve.get_entrances() if sources is None else list(sources)
+    targets = to_solve.get_exits() if targets is None else list(targets)
+    return sources, targets
+
+
+def _trace_path(position, node_id, parents, node):
+    """Builds the path to 'node' from whichever source it was reached from, by following 'parents', which is indexed
+    by node id, back to it"""
+    path = deque()
+    while node is not None:
+        path.appendleft(position(node))
+        node = parents[node_id(node)]
+    return path
+
+
+def _flag(to_solve, node_id, nodes):
+    """Returns a flag for every node of 'to_solve', indexed by node id, set for those in 'nodes'"""
+    flags = to_solve.node_flags()
+    for node in nodes:
+        flags[node_id(node)] = 1
+    return flags
+
+
+def _nearest(positions):
+    """Returns a function giving the Manhattan distance from a position to the nearest of 'positions'. When they all
+    lie in one row, as the exits of a maze do, the nearest is found by a binary search rather than by trying them all"""
+    rows = {y for _, y in positions}
+    if len(rows) != 1:
+        def distance(position):
+            return min(get_distance(position, target) for target in positions)
+        return distance
+
+    row = rows.pop()
+    xs = sorted(x for x, _ in positions)
+
+    def distance(position):
+        x, y = position
+        i = bisect_left(xs, x)
+        across = min(abs(xs[j] - x) for j in (i - 1, i) if 0 <= j < len(xs))
+        return abs(y - row) + across
+    return distance
+
+
+def multi_source_bfs(to_solve, sources=None, targets=None, stats=None) -> list:
+    """Finds the path with the fewest nodes from any of the nodes in 'sources' to any of those in 'targets' -- by
+    default, from any entrance of the maze to any exit -- with a single breadth-first search that starts from every
+    source at once. Works on both a Maze and a CompactMaze, and returns the same kind of result as the other solvers;
+    the path runs from the source it was found from to the target it reached. If 'stats' (a stats.Stats) is given,
+    the number of nodes expanded and reached is added to it"""
+    sources, targets = _endpoints(to_solve, sources, targets)
+    neighbors, position, node_id = graph_access(to_solve)
+    targets = _flag(to_solve, node_id, targets)
+
+    # every source starts out reached, with no parent, and they all go on the queue together. Like the rest of the
+    # state of the search, the flags and parents are indexed by node id
+    reached = to_solve.node_flags()
+    parents = to_solve.node_values(None)
+    queue = deque()
+    for source in sources:
+        if not reached[node_id(source)]:
+            reached[node_id(source)] = 1
+            queue.append(source)
+
+    node_count = 0
+    found = None
+    while queue:
+        current = queue.popleft()
+        node_count += 1
+
+        if targets[node_id(current)]:
+            found = current
+            break
+
+        for child, _ in neighbors(current):
+            child_id = node_id(child)
+            if not reached[child_id]:
+                reached[child_id] = 1
+                parents[child_id] = current
+                queue.append(child)
+
+    if stats is not None:
+        stats.count("nodes_expanded", node_count)
+        stats.count("nodes_reached", reached.count(1))
+
+    if found is None:
+        return False, node_count, []
+    return True, node_count, _trace_path(position, node_id, parents, found)
+
+
+def multi_source_a_star(to_solve, sources=None, targets=None, stats=None) -> list:
+    """Finds the shortest path, in pixels, from any of the nodes in 'sources' to any of those in 'targets' -- by
+    default, from any entrance of the maze to any exit -- with a single A* search that starts from every source at
+    once. The heuristic is the Manhattan distance to the nearest target, which never overestimates and never drops by
+    more than the length of an edge, so the first target taken from the open set ends a shortest path. Works on both a
+    Maze and a CompactMaze. If 'stats' (a stats.Stats) is given, the number of nodes expanded and the operations made
+    on the open set are added to it"""
+    sources, targets = _endpoints(to_solve, sources, targets)
+    neighbors, position, node_id = graph_access(to_solve)
+    heuristic = _nearest([position(target) for target in targets])
+    targets = _flag(to_solve, node_id, targets)
+
+    # as in the bidirectional A*, the open set is a plain heap of (priority, tie breaker, node); rather than decreasing
+    # keys, we push a node again when we find a shorter path to it and skip the stale entry when it comes out. The
+    # distances, parents and closed flags are indexed by node id
+    infinity = float("inf")
+    tie = itertools.count()
+    distances = to_solve.node_values(infinity)
+    parents = to_solve.node_values(None)
+    open_set = []
+    for source in sources:
+        if distances[node_id(source)] == infinity:
+            distances[node_id(source)] = 0
+            heapq.heappush(open_set, (heuristic(position(source)), next(tie), source))
+
+    closed = to_solve.node_flags()
+    node_count = 0
+    found = None
+    while open_set:
+        _, _, current = heapq.heappop(open_set)
+        current_id = node_id(current)
+        if closed[current_id]:
+            continue
+        closed[current_id] = 1
+        node_count += 1
+
+        if targets[current_id]:
+            found = current
+            break
+
+        current_distance = distances[current_id]
+        for child, length in neighbors(current):
+            child_id = node_id(child)
+            path_length = current_distance + length
+            if path_length < distances[child_id]:
+                distances[child_id] = path_length
+                parents[child_id] = current
+                heapq.heappush(open_set, (path_length + heuristic(position(child)), next(tie), child))
+
+    # every entry pushed has a number from 'tie'; those that were popped but not expanded were stale
+    if stats is not None:
+        pushes = next(tie)
+        pops = pushes - len(open_set)
+        stats.count("nodes_expanded", node_count)
+        stats.count("queue_inserts", pushes)
+        stats.count("queue_removals", pops)
+        stats.count("stale_entries_skipped", pops - node_count)
+
+    if found is None:
+        return False, node_count, []
+    return True, node_count, _trace_path(position, node_id, parents, found)
@@ -0,0 +1,83 @@
+# pymaze
+# Run several solvers at once, each in its own process, over a graph published in shared memory
+
+from multiprocessing import Pipe, Process, shared_memory
+import time
+
+import numpy as np
+
+from compact import CompactMaze
+from registry import Result
+
+
+def publish(graph: CompactMaze):
+    """Copies the arrays of 'graph' into a new block of shared memory. Returns the SharedMemory object, which the caller
+    must close and unlink once every worker is done with it, and a layout describing where each array lives"""
+    arrays, size = graph.array_layout()
+
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for name, array, offset in arrays:
+        np.ndarray(array.shape, array.dtype, buffer=block.buf, offset=offset)[:] = array
+
+    layout = {
+        "name": block.name,
+        "width": graph.width,
+        "height": graph.height,
+        "start": graph.start,
+        "end": graph.end,
+        "arrays": [(name, array.dtype.str, array.shape, offset) for name, array, offset in arrays],
+    }
+    return block, layout
+
+
+def attach(layout):
+    """Attaches to a graph published with 'publish'. Returns the SharedMemory object, which must be kept open for as
+    long as the graph is in use, and a CompactMaze whose arrays are views of the shared block"""
+    block = shared_memory.SharedMemory(name=layout["name"])
+    arrays = {name: np.ndarray(shape, dtype, buffer=block.buf, offset=offset)
+              for name, dtype, shape, offset in layout["arrays"]}
+    graph = CompactMaze.from_arrays(layout["width"], layout["height"], layout["start"], layout["end"], arrays)
+    return block, graph
+
+
+def _worker(layout, solver, connection):
+    """Process entry point: solves the shared graph with 'solver' and sends the result and time back"""
+    block, graph = attach(layout)
+    try:
+        t0 = time.perf_counter()
+        solved, explored_count, path = solver(graph)
+        t1 = time.perf_counter()
+        connection.send((solved, explored_count, list(path), t1 - t0))
+    finally:
+        # drop our views of the block before closing it
+        del graph
+        block.close()
+        connection.close()
+
+
+def solve_in_parallel(graph: CompactMaze, solvers: dict) -> dict:
+    """Runs every solver in 'solvers' (a dictionary from a name to a solving function) on 'graph' at the same time, each
+    in its own process. The graph is built once and shared with every process rather than copied. Returns a dictionary
+    from each name to a registry.Result"""
+    block, layout = publish(graph)
+    try:
+        workers = {}
+        for name, solver in solvers.items():
+            receiver, sender = Pipe(duplex=False)
+            process = Process(target=_worker, args=(layout, solver, sender))
+            process.start()
+            sender.close()
+            workers[name] = (process, receiver)
+
+        results = {}
+        for name, (process, receiver) in workers.items():
+            try:
+                results[name] = Result(*receiver.recv())
+            except EOFError:
+                raise Exception("The worker running " + name + " exited without a result.")
+            finally:
+                process.join()
+        return results
+    finally:
+        block.close()
+        block.unlink()
@@ -0,0 +1,130 @@
+# pymaze
+# Benchmark the priority queues by replaying the exact sequence of operations A* performs on real mazes
+
+from compact import CompactMaze
+from a_star import a_star
+from FibonacciHeap import FibHeap
+from priority_queue import PriorityQueue, FibPQ, HeapPQ, QueuePQ, IndexedHeapPQ
+
+import argparse
+import itertools
+import time
+from PIL import Image
+
+queues = {
+    "fib": FibPQ,
+    "heap": HeapPQ,
+    "queue": QueuePQ,
+    "indexed": IndexedHeapPQ,
+}
+
+# the operations in a trace
+INSERT, REMOVE_MINIMUM, DECREASE_KEY = range(3)
+
+
+class TraceRecorder(PriorityQueue):
+    """A priority queue that records every operation made on it as it passes them on to an IndexedHeapPQ.
+    A* is free to pop any of several nodes with the same priority, and different queues break those ties differently;
+    if a replay popped another node than the recording did, a later decrease_key could refer to a node that had already
+    left the queue. So the recorder makes every key unique -- ordered by priority, then by when it was set -- and since
+    A* never reads the keys back, it behaves just as it would with the plain queue. Every queue then pops exactly the
+    same nodes in exactly the same order during a replay.
+    Note that this means a replay measures the queues alone: in A* itself, HeapPQ and QueuePQ also compare the values
+    of entries whose priorities are tied, which for Node objects means calling Node.__lt__, and that a replay never
+    does"""
+    def __init__(self):
+        self.queue = IndexedHeapPQ()
+        self.trace = []
+        self.ids = {}
+        self.tie = itertools.count()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def _key(self, priority):
+        return priority << 32 | next(self.tie)
+
+    def insert(self, node):
+        node.key = self._key(node.key)
+        self.ids[node] = len(self.ids)
+        self.trace.append((INSERT, self.ids[node], node.key))
+        self.queue.insert(node)
+
+    def minimum(self):
+        return self.queue.minimum()
+
+    def remove_minimum(self):
+        self.trace.append((REMOVE_MINIMUM, None, None))
+        return self.queue.remove_minimum()
+
+    def decrease_key(self, node, new_priority):
+        key = self._key(new_priority)
+        self.trace.append((DECREASE_KEY, self.ids[node], key))
+        self.queue.decrease_key(node, key)
+
+
+def record(to_solve):
+    """Solves 'to_solve' with A* and returns the trace of its priority queue operations"""
+    recorders = []
+
+    def queue_type():
+        recorders.append(TraceRecorder())
+        return recorders[-1]
+
+    a_star(to_solve, queue_type)
+    return recorders[0].trace
+
+
+def replay(queue_type, trace):
+    """Performs the operations in 'trace' on a new 'queue_type', returning the time taken and the keys removed, in
+    order. The nodes are created up front, so only the queue itself is timed"""
+    # the ids in the trace number the nodes in the order they were inserted
+    nodes = [FibHeap.Node(key, node_id) for operation, node_id, key in trace if operation == INSERT]
+    removed = []
+
+    pq = queue_type()
+    t0 = time.perf_counter()
+    for operation, node_id, key in trace:
+        if operation == REMOVE_MINIMUM:
+            removed.append(pq.remove_minimum().key)
+        elif operation == INSERT:
+            pq.insert(nodes[node_id])
+        else:
+            pq.decrease_key(nodes[node_id], key)
+    t1 = time.perf_counter()
+
+    return t1 - t0, removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record the priority queue operations A* makes when solving mazes, "
+                                                 "then time each priority queue on them")
+    parser.add_argument('-i', '--infiles', help="The paths to the images containing the mazes", nargs="+",
+                        required=True)
+    parser.add_argument('-q', '--queues', help="The priority queues to time", choices=list(queues), nargs="+",
+                        default=list(queues))
+    parser.add_argument('-r', '--repeat', help="How many times to replay each trace; the best time is reported",
+                        type=int, default=3)
+    args = parser.parse_args()
+
+    for path in args.infiles:
+        with Image.open(path) as image:
+            trace = record(CompactMaze(image))
+
+        counts = [sum(1 for operation, _, _ in trace if operation == kind)
+                  for kind in (INSERT, REMOVE_MINIMUM, DECREASE_KEY)]
+        print(path + ":", len(trace), "operations ({} inserts, {} removals, {} decreases)".format(*counts))
+
+        expected = None
+        for name in args.queues:
+            best = float("inf")
+            for _ in range(args.repeat):
+                elapsed, removed = replay(queues[name], trace)
+                best = min(best, elapsed)
+
+            # every queue must remove the same keys in the same order
+            if expected is None:
+                expected = removed
+            status = "" if removed == expected else " (WRONG ORDER)"
+            print("  {:<8} {:.3f} s, {:.0f} ns per operation{}".format(name, best, best / len(trace) * 1e9, status))
+        print()
@@ -1,5 +1,6 @@
 """Our priority queues for use in A*.
-This code, like our Fibonacci heap implementation, comes from Dr. Mike Pound at the University of Nottingham"""
+This code, like our Fibonacci heap implementation, comes from Dr. Mike Pound at the University of Nottingham, apart
+from IndexedHeapPQ, BucketPQ and CountingPQ"""
 
 from abc import ABCMeta, abstractmethod
 import itertools
@@ -133,3 +134,191 @@ class QueuePQ(PriorityQueue):
         node.key = new_priority
         self.insert(node)
 
+
+class IndexedHeapPQ(PriorityQueue):
+    """A 4-ary heap of FibHeap nodes, each of which remembers where it is in the heap (in node.index). This lets
+    decrease_key move a node up from where it is instead of adding a second entry and marking the first as removed,
+    so nothing stale is ever left in the heap and no entries are hashed. Nodes are only ever compared by their keys,
+    which are kept in a list alongside the nodes so that sifting doesn't have to look up attributes. A 4-ary heap is
+    half as deep as a binary one, which makes insertions and decreases cheaper for a few more comparisons when
+    removing the minimum"""
+    def __init__(self):
+        self.nodes = []
+        self.keys = []
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def insert(self, node):
+        self.nodes.append(node)
+        self.keys.append(node.key)
+        self._sift_up(len(self.nodes) - 1, node, node.key)
+
+    def minimum(self):
+        return self.nodes[0]
+
+    def remove_minimum(self):
+        nodes = self.nodes
+        top = nodes[0]
+        last = nodes.pop()
+        last_key = self.keys.pop()
+        if nodes:
+            self._sift_down(0, last, last_key)
+        top.index = -1
+        return top
+
+    def decrease_key(self, node, new_priority):
+        node.key = new_priority
+        self._sift_up(node.index, node, new_priority)
+
+    def _sift_up(self, i, node, key):
+        # move parents down into the hole at 'i' until we find where the node belongs; a node never passes a parent
+        # with the same key, so nodes with equal keys tend to leave in the order they came in
+        nodes = self.nodes
+        keys = self.keys
+        while i > 0:
+            parent_index = (i - 1) >> 2
+            parent_key = keys[parent_index]
+            if parent_key <= key:
+                break
+            parent = nodes[parent_index]
+            nodes[i] = parent
+            keys[i] = parent_key
+            parent.index = i
+            i = parent_index
+        nodes[i] = node
+        keys[i] = key
+        node.index = i
+
+    def _sift_down(self, i, node, key):
+        # move the smallest child up into the hole at 'i' until the node is no larger than any of them
+        nodes = self.nodes
+        keys = self.keys
+        size = len(nodes)
+        while True:
+            first = 4 * i + 1
+            if first >= size:
+                break
+
+            # find the smallest child; most nodes have all four, which is worth writing out
+            if first + 4 <= size:
+                key0, key1, key2, key3 = keys[first:first + 4]
+                best, best_key = first, key0
+                if key1 < best_key:
+                    best, best_key = first + 1, key1
+                if key2 < best_key:
+                    best, best_key = first + 2, key2
+                if key3 < best_key:
+                    best, best_key = first + 3, key3
+            else:
+                children = keys[first:size]
+                best_key = min(children)
+                best = first + children.index(best_key)
+
+            if best_key >= key:
+                break
+            child = nodes[best]
+            nodes[i] = child
+            keys[i] = best_key
+            child.index = i
+            i = best
+        nodes[i] = node
+        keys[i] = key
+        node.index = i
+
+
+class BucketPQ(PriorityQueue):
+    """A bucket queue: a list of buckets, one for each priority, holding the nodes with that priority. Insertions and
+    decreases just move a node between buckets, and removing the minimum takes a node from the lowest bucket that isn't
+    empty, so nothing is ever compared. This only works for small non-negative integer priorities, and is only fast if
+    the minimum never goes back down much -- both true of A* on a maze, where priorities are Manhattan distances and,
+    as the heuristic is consistent, the minimum never decreases at all. Each node remembers its place in its bucket (in
+    node.index), so it can be taken out of the bucket without searching it"""
+    def __init__(self):
+        self.buckets = []
+        self.lowest = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def insert(self, node):
+        key = node.key
+        buckets = self.buckets
+        if key >= len(buckets):
+            buckets.extend([] for _ in range(key + 1 - len(buckets)))
+
+        bucket = buckets[key]
+        node.index = len(bucket)
+        bucket.append(node)
+        if key < self.lowest:
+            self.lowest = key
+        self.count += 1
+
+    def minimum(self):
+        self._find_lowest()
+        return self.buckets[self.lowest][-1]
+
+    def remove_minimum(self):
+        self._find_lowest()
+        self.count -= 1
+        return self.buckets[self.lowest].pop()
+
+    def decrease_key(self, node, new_priority):
+        # fill the node's place in its bucket with the last node in that bucket
+        bucket = self.buckets[node.key]
+        last = bucket.pop()
+        if last is not node:
+            bucket[node.index] = last
+            last.index = node.index
+
+        self.count -= 1
+        node.key = new_priority
+        self.insert(node)
+
+    def _find_lowest(self):
+        buckets = self.buckets
+        lowest = self.lowest
+        while not buckets[lowest]:
+            lowest += 1
+        self.lowest = lowest
+
+
+class CountingPQ(PriorityQueue):
+    """Wraps another priority queue and counts the operations made on it. This is only used when a solver has been
+    asked for statistics, as the extra layer of calls isn't free"""
+    def __init__(self, queue):
+        self.queue = queue
+        self.inserts = 0
+        self.removals = 0
+        self.decreases = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def insert(self, node):
+        self.inserts += 1
+        self.queue.insert(node)
+
+    def minimum(self):
+        return self.queue.minimum()
+
+    def remove_minimum(self):
+        self.removals += 1
+        return self.queue.remove_minimum()
+
+    def decrease_key(self, node, new_priority):
+        self.decreases += 1
+        self.queue.decrease_key(node, new_priority)
+
+    def record(self, stats):
+        """Adds the counts to 'stats' (a stats.Stats). For the queues that decrease keys by adding a new entry and
+        marking the old one as removed, this also counts the stale entries they had to skip over"""
+        stats.count("queue_inserts", self.inserts)
+        stats.count("queue_removals", self.removals)
+        stats.count("queue_decrease_keys", self.decreases)
+
+        entries = getattr(self.queue, "pq", None)
+        if entries is not None:
+            remaining = entries.qsize() if isinstance(entries, queue.PriorityQueue) else len(entries)
+            stats.count("stale_entries_skipped", self.inserts + self.decreases - self.removals - remaining)
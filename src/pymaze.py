@@ -1,15 +1,13 @@
-# user-modules
-from maze import *
-from breadth_first import *
-from depth_first import *
-from a_star import *
-from draw_solution import *
-from wall_follow import *
+# user-modules. Only the light ones are imported up front: the registry imports each solver the first time it is used,
+# and PIL, NumPy and the graph builders are imported where they are needed, so a short run only pays for what it uses
+from registry import SOLVERS
+from stats import Stats, phase
 
 # built-in modules
 import time     # so we can keep track of how long operations take
 import argparse  # so we can use command-line arguments
-from PIL import Image
+import sys  # so we can write the statistics to standard output and everything else to standard error
+from contextlib import redirect_stdout
 
 
 def min_length(nmin):
@@ -24,6 +22,96 @@ def min_length(nmin):
     return MinimumLength
 
 
+def compare_graphs(maze_image, algorithms):
+    """Builds both the Node-based and the compact graph for 'maze_image' and runs each algorithm in 'algorithms' on
+    both, reporting the memory used by each graph along with the build and solve times"""
+    import tracemalloc  # so we can measure how much memory the graphs use
+    from maze import Maze
+    from compact import CompactMaze
+
+    for name, graph_type in (("Object graph", Maze), ("Compact graph", CompactMaze)):
+        print(name + ":")
+
+        # time the build without tracing memory, as tracing slows down allocation considerably
+        t0 = time.time()
+        to_solve = graph_type(maze_image)
+        t1 = time.time()
+        del to_solve
+
+        tracemalloc.start()
+        to_solve = graph_type(maze_image)
+        graph_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        print("Nodes:", to_solve.get_num_nodes())
+        print("Build time:", t1 - t0)
+        print("Memory:", round(graph_memory / 2 ** 20, 2), "MiB")
+
+        for algorithm in algorithms:
+            solved, explored_count, path, solve_time = SOLVERS[algorithm].solve(to_solve)
+            print(SOLVERS[algorithm].label, "time:", solve_time, "(considered", explored_count, "nodes, path of",
+                  len(path), "nodes)")
+
+        del to_solve
+        print()
+
+
+def build_graph(maze_path, maze_image, graph, streaming, cache, fill=False):
+    """Builds the graph for the maze at 'maze_path' -- a Maze, a CompactMaze if 'graph' is "compact", or a LazyMaze,
+    which finds its nodes as it is solved, if 'graph' is "lazy". A cache is only used with "compact" graphs: the graph
+    is memory-mapped from the cache if the image has been seen before, and built and added to it otherwise. With
+    'fill', the dead ends of the maze are filled in before the graph is built"""
+    from maze import Maze
+    from compact import CompactMaze
+
+    def build(compact):
+        if fill:
+            import dead_ends
+            t0 = time.time()
+            result, removed = dead_ends.scan_filled(maze_image)
+            print("Dead-end filling removed", removed, "nodes (took", time.time() - t0, "seconds)")
+            return CompactMaze.from_scan(result) if compact else Maze.from_scan(result)
+        if streaming:
+            import stream
+            return stream.load(maze_path, compact=compact)
+        return CompactMaze(maze_image) if compact else Maze(maze_image)
+
+    if graph == "lazy":
+        from lazy_maze import LazyMaze
+        return LazyMaze(maze_image)
+    if cache is None:
+        return build(graph == "compact")
+
+    from file_cache import image_hash
+
+    # the cache stores compact graphs, which is why it can't be used with any other: turning the mapped arrays into
+    # Node objects would take nearly as long as scanning the image again. Filled graphs are kept apart from the others
+    key = image_hash(maze_path) + ("-filled" if fill else "")
+    compact = cache.load(key)
+    if compact is not None:
+        print("Loaded graph from cache")
+    else:
+        compact = build(True)
+        cache.store(key, compact)
+
+    return compact
+
+
+def save_solution(maze_image, path, output_path, stats=None):
+    """Draws 'path' on an RGB copy of 'maze_image' and saves it to 'output_path'. Returns the length of the path in
+    pixels, as calculated by draw_solution"""
+    from draw_solution import draw_solution
+
+    if maze_image.mode != "RGB":
+        with phase(stats, "convert"):
+            maze_image = maze_image.convert("RGB")
+    with phase(stats, "draw"):
+        solution_img, total_distance = draw_solution(maze_image, path)
+    with phase(stats, "save"):
+        solution_img.save(output_path)
+    return total_distance
+
+
 def main(argv):
     # if we get an error when trying to solve the maze, we will catch it and display the error message
     try:
@@ -31,19 +119,149 @@ def main(argv):
         output_path = argv.outfile
         algorithm = argv.algorithm
         compare = argv.compare
-
-        # load the image and convert to RGB format
-        print("Loading image...")
-        maze_image = Image.open(maze_path)
-        maze_image = maze_image.convert("RGB")
+        parallel = argv.parallel
+
+        # the graph cache holds compact graphs, so that is the graph it implies when none is asked for
+        graph = argv.graph
+        if graph is None:
+            graph = "compact" if argv.cache is not None else "object"
+        streaming = argv.stream and graph != "both"
+        fill = argv.fill_dead_ends
+
+        # filling dead ends needs the whole image at once, and builds a single graph
+        if fill and (streaming or graph == "both"):
+            raise Exception("Dead ends can't be filled in when streaming the image or comparing graphs.")
+
+        # the lazy maze reads its nodes from the image while it is being solved, so there is no graph to stream, cache,
+        # fill in, or share with other processes
+        if graph == "lazy" and (streaming or argv.cache is not None or fill or parallel):
+            raise Exception("The lazy graph can't be streamed, cached, filled in or solved in parallel.")
+        if argv.cache is not None and graph in ("object", "both"):
+            raise Exception("The graph cache holds compact graphs, so it can only be used with -g compact.")
+
+        # the parallel comparison shares the compact graph between processes
+        if parallel:
+            if not compare:
+                raise Exception("The parallel flag can only be used when comparing algorithms.")
+            graph = "compact"
+
+        # the graph cache, if we are using one
+        cache = None
+        if argv.cache is not None:
+            from graph_cache import GraphCache
+            cache = GraphCache(argv.cache, argv.cache_size * 2 ** 20)
+
+        # the solution cache, if we are using one. Comparisons are there to time the solvers, so they always solve
+        solution_cache = None
+        if argv.solution_cache is not None and not compare and graph != "both":
+            from solution_cache import SolutionCache
+            solution_cache = SolutionCache(argv.solution_cache, argv.solution_cache_size * 2 ** 20)
+
+        # the statistics to write out at the end, if we were asked for them
+        stats = Stats(argv.trace_memory) if argv.stats is not None else None
+
+        # a maze that has been solved with this algorithm before is neither built nor searched again; we only open the
+        # image if we are drawing the solution
+        record = None
+        if solution_cache is not None:
+            from file_cache import image_hash
+            from solution_cache import solution_key
+            with phase(stats, "lookup"):
+                key = solution_key(image_hash(maze_path), algorithm, fill)
+                record = solution_cache.load(key)
+
+        # load the image; 1-bit, grayscale and palette images are read as they are, and anything else is converted to
+        # RGB. When streaming or caching, the image is only decoded in full if we need it to build the graph or to draw
+        if record is None or (record["solved"] and not argv.no_draw):
+            from PIL import Image
+            from maze import native_image
+
+            print("Loading image...")
+            deferred = streaming or cache is not None or solution_cache is not None
+            with phase(stats, "load"):
+                maze_image = Image.open(maze_path)
+                if not deferred:
+                    maze_image.load()
+            if not deferred:
+                with phase(stats, "convert"):
+                    maze_image = native_image(maze_image)
+        else:
+            maze_image = None
+
+        if solution_cache is not None:
+            if record is not None:
+                print("Loaded solution from cache")
+                print("Found", record["nodes"], "nodes when the maze was first solved, in", record["build_time"],
+                      "seconds")
+                if stats is not None:
+                    stats.count("nodes", record["nodes"])
+                if record["solved"]:
+                    print("Nodes explored:", record["explored"])
+                    print("Path length:", len(record["path"]), "nodes")
+                    print("Time elapsed when first solved:", record["solve_time"])
+                    if not argv.no_draw:
+                        print()
+                        print("Drawing image...")
+                        total_distance = save_solution(maze_image, record["path"], output_path, stats)
+                        print("Path length as calculated by draw_solution:", total_distance, "pixels")
+                else:
+                    print("No solution.")
+
+                if maze_image is not None:
+                    maze_image.close()
+                if stats is not None:
+                    stats.write(argv.stats)
+                print("Done.")
+                return 0
+
+        # if we are comparing graph representations, we don't need to draw a solution
+        if graph == "both":
+            print()
+            compare_graphs(maze_image, compare or [algorithm])
+            maze_image.close()
+            if stats is not None:
+                stats.write(argv.stats)
+            print("Done.")
+            return 0
+
+        # a maze whose end can't be reached from its start, by any of the algorithms we were asked to run, is turned
+        # away before we spend any time building or searching it
+        if argv.check:
+            import connectivity
+            with phase(stats, "check"):
+                regions = connectivity.regions(maze_image)
+            if regions is not None:
+                if stats is not None:
+                    stats.count("regions", len(regions.sizes))
+                any_opening = any(SOLVERS[name].any_opening for name in compare or [algorithm])
+                if not regions.solvable(any_opening):
+                    print("The maze has", len(regions.sizes), "separate regions of path, and",
+                          "no exit is in the same one as any entrance" if any_opening else
+                          "the end isn't in the same one as the start", "(the start's has",
+                          regions.sizes[regions.entrances[0]], "pixels and the end's",
+                          str(regions.sizes[regions.exits[0]]) + ")")
+                    print("No solution.")
+                    maze_image.close()
+                    if stats is not None:
+                        stats.write(argv.stats)
+                    print("Done.")
+                    return 0
 
         print("Creating maze...")
         t0 = time.time()
-        to_solve = Maze(maze_image)
+        with phase(stats, "build"):
+            to_solve = build_graph(maze_path, maze_image, graph, streaming, cache, fill)
+            if stats is not None and graph != "lazy":
+                stats.count("nodes", to_solve.get_num_nodes())
         t1 = time.time()
         scan_total = t1 - t0
 
-        print("Found", to_solve.get_num_nodes(), "nodes")
+        if graph == "lazy":
+            print("Found the entrances and exits; the other nodes are found as the maze is solved")
+        else:
+            print("Found", to_solve.get_num_nodes(), "nodes")
+        if len(to_solve.get_entrances()) > 1 or len(to_solve.get_exits()) > 1:
+            print("The maze has", len(to_solve.get_entrances()), "entrances and", len(to_solve.get_exits()), "exits")
         print("Time elapsed:", scan_total)
 
         print()
@@ -51,63 +269,51 @@ def main(argv):
 
         # if we are just using one algorithm
         if not compare:
-            # breadth-first search
-            if algorithm == "bfs":
-                print("Algorithm = BFS")
-                t0 = time.time()
-                solved, explored_count, path = breadth_first_search(to_solve)
-                t1 = time.time()
-            # depth-first search
-            elif algorithm == "dfs":
-                print("Algorithm = DFS")
-                t0 = time.time()
-                solved, explored_count, path = depth_first_search(to_solve)
-                t1 = time.time()
-            # A*
-            elif algorithm == "a*":
-                print("Algorithm = A*")
-                t0 = time.time()
-                solved, explored_count, path = a_star(to_solve)
-                t1 = time.time()
-            # Wall follow method
-            elif algorithm == "wall":
-                print("Algorithm = right-hand wall follow method")
-                t0 = time.time()
-                solved, explored_count, path = wall_follower(to_solve)
-                t1 = time.time()
-            else:
+            solver = SOLVERS.get(algorithm)
+            if solver is None:
                 raise Exception("You must specify an algorithm.")
+            print("Algorithm =", solver.description)
+            with phase(stats, "solve"):
+                solved, explored_count, path, solve_total = solver.solve(to_solve, stats=stats)
+
+            if graph == "lazy":
+                print("Found", to_solve.get_num_nodes(), "nodes while solving")
+                if stats is not None:
+                    stats.count("nodes", to_solve.get_num_nodes())
 
-            solve_total = t1 - t0
+            if solution_cache is not None:
+                solution_cache.store(key, solved, explored_count, path, to_solve.get_num_nodes(), scan_total,
+                                     solve_total)
 
             # print out our data and draw our image, if there is a solution to the maze
             if solved:
                 print("Nodes explored:", explored_count)
                 print("Path length:", len(path), "nodes")
                 print("Time elapsed:", solve_total)
-                print()
-                print("Drawing image...")
-                # our draw_solution function will also calculate the distance traversed in the path
-                solution_img, total_distance = draw_solution(maze_image, path)
-                solution_img.save(output_path)
-                print("Path length as calculated by draw_solution:", total_distance, "pixels")
+                if not argv.no_draw:
+                    print()
+                    print("Drawing image...")
+                    # our draw_solution function will also calculate the distance traversed in the path
+                    total_distance = save_solution(maze_image, path, output_path, stats)
+                    print("Path length as calculated by draw_solution:", total_distance, "pixels")
             else:
                 print("No solution.")
 
         # otherwise, we have algorithms to compare
         else:
-            # todo: generalize this since we are accruing more algorithms
-            a_star_time = None
-            a_star_solved = False
-
-            bfs_time = None
-            bfs_solved = False
-
-            dfs_time = None
-            dfs_solved = False
-
-            wall_time = None
-            wall_solved = False
+            # each algorithm may only be compared once
+            if len(set(compare)) != len(compare):
+                raise Exception("Invalid algorithm for comparison")
+
+            # in parallel mode, every algorithm runs at once in its own process; otherwise, we run each one in turn as
+            # we print its results
+            if parallel:
+                from parallel import solve_in_parallel
+                with phase(stats, "solve"):
+                    results = solve_in_parallel(to_solve, {algorithm: SOLVERS[algorithm].function
+                                                           for algorithm in compare})
+            else:
+                results = {}
 
             # track the shortest explored path and the path that was found quickest
             fewest_nodes = [float("inf"), ""]
@@ -116,91 +322,39 @@ def main(argv):
 
             # iterate through each algorithm in the comparison list
             for algorithm in compare:
-                # check which algorithm we want and verify that we haven't supplied the same algorithm more than once
-                # by checking whether our time variable has been modified
-                if algorithm == "a*" and a_star_time is None:
-                    print("Running A* ...")
-                    t0 = time.time()
-                    a_star_solved, a_star_explored_count, a_star_path = a_star(to_solve)
-                    t1 = time.time()
-                    a_star_time = t1 - t0
-
-                    print("Time:", a_star_time)
-                    print("Nodes considered:", a_star_explored_count)
-                    print("Nodes in path:", len(a_star_path))
-                    print()
-
-                    if len(a_star_path) < fewest_nodes[0]:
-                        fewest_nodes = [len(a_star_path), "A*"]
-
-                    if a_star_explored_count < fewest_considered[0]:
-                        fewest_considered = [a_star_explored_count, "A*"]
-
-                    if a_star_time < fastest_compute_time[0]:
-                        fastest_compute_time = [a_star_time, "A*"]
-                elif algorithm == "bfs" and bfs_time is None:
-                    print("Running BFS ...")
-                    t0 = time.time()
-                    bfs_solved, bfs_explored_count, bfs_path = breadth_first_search(to_solve)
-                    t1 = time.time()
-                    bfs_time = t1 - t0
-
-                    print("Time:", bfs_time)
-                    print("Nodes considered:", bfs_explored_count)
-                    print("Nodes in path:", len(bfs_path))
-                    print()
-
-                    if len(bfs_path) < fewest_nodes[0]:
-                        fewest_nodes = [len(bfs_path), "BFS"]
-
-                    if bfs_explored_count < fewest_considered[0]:
-                        fewest_considered = [bfs_explored_count, "BFS"]
-
-                    if bfs_time < fastest_compute_time[0]:
-                        fastest_compute_time = [bfs_time, "BFS"]
-                elif algorithm == "dfs" and dfs_time is None:
-                    print("Running DFS ...")
-                    t0 = time.time()
-                    dfs_solved, dfs_explored_count, dfs_path = depth_first_search(to_solve)
-                    t1 = time.time()
-                    dfs_time = t1 - t0
+                label = SOLVERS[algorithm].label
+                if algorithm == "wall":
+                    print("Running wall algorithm...")
+                else:
+                    print("Running", label, "...")
 
-                    print("Time:", dfs_time)
-                    print("Nodes considered:", dfs_explored_count)
-                    print("Nodes in path:", len(dfs_path))
-                    print()
+                if algorithm not in results:
+                    with phase(stats, "solve:" + algorithm):
+                        results[algorithm] = SOLVERS[algorithm].solve(to_solve, stats=stats)
 
-                    if len(dfs_path) < fewest_nodes[0]:
-                        fewest_nodes = [len(dfs_path), "DFS"]
+                algorithm_solved, explored_count, path, solve_time = results[algorithm]
 
-                    if dfs_explored_count < fewest_considered[0]:
-                        fewest_considered = [dfs_explored_count, "DFS"]
+                print("Time:", solve_time)
+                if algorithm != "wall":
+                    print("Nodes considered:", explored_count)
+                print("Nodes in path:", len(path))
+                print()
 
-                    if dfs_time < fastest_compute_time[0]:
-                        fastest_compute_time = [dfs_time, "DFS"]
-                elif algorithm == "wall" and wall_time is None:
-                    print("Running wall algorithm...")
-                    t0 = time.time()
-                    wall_solved, wall_explored_count, wall_path = wall_follower(to_solve)
-                    t1 = time.time()
-                    wall_time = t1 - t0
+                if len(path) < fewest_nodes[0]:
+                    fewest_nodes = [len(path), label]
 
-                    print("Time:", wall_time)
-                    print("Nodes in path:", len(wall_path))
-                    print()
+                if explored_count < fewest_considered[0]:
+                    fewest_considered = [explored_count, label]
 
-                    if len(wall_path) < fewest_nodes[0]:
-                        fewest_nodes = [len(wall_path), "wall"]
-                    
-                    if wall_explored_count < fewest_considered[0]:
-                        fewest_considered = [wall_explored_count, "wall"]
-                    
-                    if wall_time < fastest_compute_time[0]:
-                        fastest_compute_time = [wall_time, "wall"]
-                else:
-                    raise Exception("Invalid algorithm for comparison")
+                if solve_time < fastest_compute_time[0]:
+                    fastest_compute_time = [solve_time, label]
 
-            solved = a_star_solved or bfs_solved or dfs_solved or wall_solved
+            solved = any(result[0] for result in results.values())
+            if graph == "lazy":
+                print("Found", to_solve.get_num_nodes(), "nodes while solving")
+                if stats is not None:
+                    stats.count("nodes", to_solve.get_num_nodes())
+                print()
 
             if solved:
                 # set up our list to track which algorithm has the shortest length; if the lengths of two algorithms are
@@ -208,35 +362,32 @@ def main(argv):
                 shortest_length = [float("inf"), ""]
                 paths_equal = False
 
-                if dfs_time is not None and dfs_solved:
-                    print("Drawing path generated by DFS (red)...")
-                    maze_image, dfs_path_length = draw_solution(maze_image, dfs_path, (255, 0, 0))
-
-                    if dfs_path_length < shortest_length[0]:
-                        shortest_length = [dfs_path_length, "DFS"]
-                if bfs_time is not None and bfs_solved:
-                    print("Drawing path generated by BFS (green)...")
-                    maze_image, bfs_path_length = draw_solution(maze_image, bfs_path, (0, 255, 0))
-
-                    if bfs_path_length < shortest_length[0]:
-                        shortest_length = [bfs_path_length, "BFS"]
-                    elif bfs_path_length == shortest_length[0]:
-                        paths_equal = True
-                if a_star_time is not None and a_star_solved:
-                    print("Drawing path generated by A* (blue)...")
-                    maze_image, a_star_path_length = draw_solution(maze_image, a_star_path, (0, 0, 255))
-
-                    if a_star_path_length < shortest_length[0]:
-                        shortest_length = [a_star_path_length, "A*"]
-                    elif a_star_path_length == shortest_length[0]:
-                        paths_equal = True
-                if wall_time is not None and wall_solved:
-                    print("Drawing path generated by the wall algorithm (purple)...")
-                    maze_image, wall_path_length = draw_solution(maze_image, wall_path, (127, 0, 127))
-
-                    if wall_path_length < shortest_length[0]:
-                        shortest_length = [wall_path_length, "wall"]
-                    elif wall_path_length == shortest_length[0]:
+                from draw_solution import draw_solution
+                if maze_image.mode != "RGB":
+                    with phase(stats, "convert"):
+                        maze_image = maze_image.convert("RGB")
+
+                # paths are always drawn in the same order, each in its own color
+                for algorithm, description, color in (("dfs", "DFS (red)", (255, 0, 0)),
+                                                      ("bfs", "BFS (green)", (0, 255, 0)),
+                                                      ("a*", "A* (blue)", (0, 0, 255)),
+                                                      ("dial", "A* with a bucket queue (yellow)", (255, 215, 0)),
+                                                      ("wall", "the wall algorithm (purple)", (127, 0, 127)),
+                                                      ("bibfs", "bidirectional BFS (orange)", (255, 127, 0)),
+                                                      ("bia*", "bidirectional A* (cyan)", (0, 191, 255)),
+                                                      ("multi-bfs", "multi-source BFS (magenta)", (255, 0, 255)),
+                                                      ("multi-a*", "multi-source A* (lime)", (127, 255, 0)),
+                                                      ("hpa*", "hierarchical A* (navy)", (0, 0, 127))):
+                    if algorithm not in results or not results[algorithm][0]:
+                        continue
+
+                    print("Drawing path generated by " + description + "...")
+                    with phase(stats, "draw:" + algorithm):
+                        maze_image, path_length = draw_solution(maze_image, results[algorithm][2], color)
+
+                    if path_length < shortest_length[0]:
+                        shortest_length = [path_length, SOLVERS[algorithm].label]
+                    elif path_length == shortest_length[0]:
                         paths_equal = True
 
                 print()
@@ -254,7 +405,8 @@ def main(argv):
                 print()
 
                 # save the resultant image
-                maze_image.save(output_path)
+                with phase(stats, "save"):
+                    maze_image.save(output_path)
 
             # otherwise, if there was no solution, alert the user
             else:
@@ -262,6 +414,8 @@ def main(argv):
 
         # close our image
         maze_image.close()
+        if stats is not None:
+            stats.write(argv.stats)
         print("Done.")
 
     except Exception as e:
@@ -277,16 +431,71 @@ if __name__ == "__main__":
     parser.add_argument('-i', '--infile', help="The path to the image containing the maze you wish to solve",
                         required=True)
     parser.add_argument('-o', '--outfile', help="The path of the solution image", default="solution.png")
+    parser.add_argument('-n', '--no-draw', action="store_true",
+                        help="Don't draw the solution; just print what was found")
     parser.add_argument('-a', '--algorithm', help="The algorithm you wish to use; may either be 'bfs' (for breadth-"
                                                   "first searching), 'dfs' (depth-first search), 'a*' (to use the A*"
-                                                  " algorithm), or 'wall' (to use the right-hand method). If unspecified, uses BFS",
-                        default="bfs", choices=["bfs", "dfs", "a*", "wall"])
-    parser.add_argument('-c', '--compare', choices=["bfs", "dfs", "a*", 'wall'], help="Compare two or more algorithms and see "
+                                                  " algorithm), 'dial' (A* with a bucket queue), 'wall' (to use the "
+                                                  "right-hand method), 'bibfs' or 'bia*' (to search from both ends "
+                                                  "at once with BFS or A*), 'multi-bfs' or 'multi-a*' (to find the "
+                                                  "best path from any entrance to any exit with BFS or A*), or "
+                                                  "'hpa*' (hierarchical A*, which builds an abstraction of the maze "
+                                                  "on its first solve and so is slower than 'a*' for a single "
+                                                  "solve). If "
+                                                  "unspecified, uses BFS",
+                        default="bfs", choices=list(SOLVERS))
+    parser.add_argument('-c', '--compare', choices=list(SOLVERS), help="Compare two or more algorithms and see "
                         "which performs best by a variety of criteria", nargs="*", action=min_length(2))
+    parser.add_argument('-g', '--graph', choices=["object", "compact", "lazy", "both"], default=None,
+                        help="The graph representation to solve; 'object' (the default) uses Node objects, 'compact' "
+                             "uses flat arrays (requires NumPy, and is the default with --cache), 'lazy' uses Node "
+                             "objects that are only found as the solver reaches them, and 'both' builds the object and "
+                             "compact graphs and reports their memory use and solve times side by side")
+    parser.add_argument('-s', '--stream', action="store_true",
+                        help="Build the graph from the image a band of rows at a time instead of converting the whole "
+                             "image to RGB first. Binary PBM and 8-bit PGM files are read straight from disk, so memory "
+                             "use depends on the width of the maze rather than its area (requires NumPy)")
+    parser.add_argument('--cache', help="A directory in which to cache maze graphs. The first time an image is solved, "
+                                        "its graph is saved there; later runs memory-map it instead of scanning the "
+                                        "image again. The cache holds compact graphs, so it implies -g compact, and "
+                                        "can't be used with any other graph (requires NumPy)", default=None)
+    parser.add_argument('--cache-size', help="The largest the graph cache may grow, in MiB; the least recently used "
+                                             "graphs are removed beyond that", type=int, default=1024)
+    parser.add_argument('--solution-cache', help="A directory in which to cache solutions. The first time an image is "
+                                                 "solved with an algorithm, the path found is saved there; later runs "
+                                                 "load it rather than building and solving the maze again. Not used "
+                                                 "when comparing", default=None)
+    parser.add_argument('--solution-cache-size', help="The largest the solution cache may grow, in MiB; the least "
+                                                      "recently used solutions are removed beyond that", type=int,
+                        default=64)
+    parser.add_argument('-f', '--fill-dead-ends', action="store_true",
+                        help="Fill in every dead end of the maze before building the graph, so that the solvers only "
+                             "see the paths between the start and the end, and any loops (requires NumPy)")
+    parser.add_argument('-k', '--check', action="store_true",
+                        help="Before building the graph, find the separate regions of path in the image, and if the end "
+                             "can't be reached from the start, say there is no solution without building or solving "
+                             "the maze (requires NumPy)")
+    parser.add_argument('--stats', help="Write timings for each phase of the run (load, convert, build, solve, draw "
+                                        "and save), along with counters from the solvers, to this file as JSON; use "
+                                        "'-' for standard output, in which case everything else is printed to "
+                                        "standard error", default=None)
+    parser.add_argument('--trace-memory', action="store_true",
+                        help="Add the peak memory allocated during each phase to the statistics. This slows everything "
+                             "down considerably, so the timings are much less useful")
+    parser.add_argument('-p', '--parallel', action="store_true",
+                        help="When comparing algorithms, run every algorithm at the same time, each in its own process. "
+                             "The compact graph is built once and shared between the processes (requires NumPy)")
 
     # if we get an error in parsing, catch and display it
     try:
         args = parser.parse_args()
-        main(args)
+        if args.stats == "-":
+            # the statistics are then the only thing written to standard output, so that it can be read as JSON; what
+            # we would normally print goes to standard error instead
+            args.stats = sys.stdout
+            with redirect_stdout(sys.stderr):
+                main(args)
+        else:
+            main(args)
     except argparse.ArgumentTypeError as err:
         print(parser.error(err))
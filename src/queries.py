@@ -0,0 +1,341 @@
+# pymaze
+# Answer many path queries on one maze from shortest-path trees that are built once and cached on the maze
+
+from array import array
+from collections import OrderedDict, deque
+import heapq
+import threading
+
+from compact import CompactMaze
+from maze import MazeException
+
+# how many shortest-path trees each maze keeps; beyond that, the least recently used tree is dropped
+TREE_CACHE_SIZE = 8
+
+
+class PathTree:
+    """The shortest paths from one node of a maze, the source, to every node that can be reached from it. The nodes
+    are numbered, and 'parents' holds the number of each node's parent on its path from the source (-1 for the
+    source itself), while 'distances' holds its distance from the source, or -1 if it can't be reached; both are
+    arrays of machine integers, so a tree over millions of nodes stays small. 'index' gives the number of the node at
+    a position, or None, and 'position' the position of a numbered node.
+    The path to any node is found by following its parents back to the source, so once the tree is built, every
+    query costs only the length of its path; the maze is never searched again"""
+    def __init__(self, source, parents, distances, index, position):
+        self.source = source
+        self.parents = parents
+        self.distances = distances
+        self.index = index
+        self.position = position
+
+    def __contains__(self, target):
+        node = self.index(target)
+        return node is not None and self.distances[node] >= 0
+
+    def distance_to(self, target):
+        """Returns the distance from the source to the node at 'target', or None if there is no path to it"""
+        return self.distances[self.index(target)] if target in self else None
+
+    def path_to(self, target):
+        """Returns the path from the source to the node at 'target' as a deque of positions, just like the paths the
+        solvers return, or None if 'target' isn't a node that can be reached from the source"""
+        if target not in self:
+            return None
+
+        path = deque()
+        current = self.index(target)
+        while current != -1:
+            path.appendleft(self.position(current))
+            current = self.parents[current]
+        return path
+
+
+class PathTrees:
+    """The shortest-path trees built for one maze, keyed by their source and whether they were weighted, and kept in
+    order of use so that the least recently used tree can be dropped once there are more than 'capacity' of them.
+    Several threads may query the same maze at once: the cache itself is guarded by a lock, although two threads
+    asking for the same missing tree at the same time may both build it"""
+    def __init__(self, to_solve, capacity=TREE_CACHE_SIZE):
+        self.to_solve = to_solve
+        self.capacity = capacity
+        self.trees = OrderedDict()
+        self.lock = threading.Lock()
+        self.nodes = NodeIndex(to_solve)
+
+    def get(self, source=None, weighted=True):
+        """Returns the shortest-path tree from the node at position 'source' (the start, if None), building it if it
+        isn't cached. A weighted tree holds the paths that are shortest in pixels, found by Dijkstra's algorithm; an
+        unweighted one holds those with the fewest nodes, found by BFS"""
+        source = _start_position(self.to_solve) if source is None else tuple(source)
+        key = (source, weighted)
+        with self.lock:
+            tree = self.trees.get(key)
+            if tree is not None:
+                self.trees.move_to_end(key)
+                return tree
+
+        tree = build_tree(self.to_solve, self.find_node(source), weighted)
+
+        with self.lock:
+            self.trees[key] = tree
+            self.trees.move_to_end(key)
+            while len(self.trees) > self.capacity:
+                self.trees.popitem(last=False)
+        return tree
+
+    def clear(self):
+        with self.lock:
+            self.trees.clear()
+
+    def find_node(self, position):
+        """Returns the node at 'position': an id for a CompactMaze, or a Node"""
+        return self.nodes.find(position)
+
+
+class NodeIndex:
+    """Finds the node of a maze at a given position. Nothing is indexed until the first lookup"""
+    def __init__(self, to_solve):
+        self.to_solve = to_solve
+        self.nodes = None   # the node at each position, once we have needed to look one up
+
+    def find(self, position):
+        """Returns the node at 'position': an id for a CompactMaze, or a Node"""
+        to_solve = self.to_solve
+        if isinstance(to_solve, CompactMaze):
+            # nodes are numbered in row-major order, so we can find one by a binary search on its row and column
+            if self.nodes is None:
+                self.nodes = to_solve.ys.astype("int64") * to_solve.width + to_solve.xs
+            x, y = position
+            key = y * to_solve.width + x
+            node = int(self.nodes.searchsorted(key))
+            if node < len(self.nodes) and self.nodes[node] == key:
+                return node
+        else:
+            # a Maze only knows its start and end, so the first time we need any other node, we find every node that
+            # can be reached from either of them
+            if self.nodes is None:
+                self.nodes = _nodes_by_position(to_solve)
+            node = self.nodes.get(tuple(position))
+            if node is not None:
+                return node
+
+        raise MazeException("There is no node at this position", tuple(position))
+
+
+def _start_position(to_solve):
+    if isinstance(to_solve, CompactMaze):
+        return to_solve.get_position(to_solve.get_start())
+    return to_solve.get_start().get_position()
+
+
+def _nodes_by_position(to_solve):
+    """Returns a dictionary of the Node at every position that can be reached from the start or the end of 'to_solve'"""
+    nodes = {}
+    queue = deque()
+    for node in (to_solve.get_start(), to_solve.get_end()):
+        if node.get_position() not in nodes:
+            nodes[node.get_position()] = node
+            queue.append(node)
+
+    while queue:
+        for neighbor in queue.popleft().neighbors.values():
+            if neighbor is not None and neighbor.get_position() not in nodes:
+                nodes[neighbor.get_position()] = neighbor
+                queue.append(neighbor)
+    return nodes
+
+
+def path_trees(to_solve):
+    """Returns the cache of shortest-path trees kept on 'to_solve', creating it the first time. It lives as long as the
+    maze does. A graph without a __dict__ has nowhere to keep it, so it gets a new, empty cache every time"""
+    trees = getattr(to_solve, "_path_trees", None)
+    if trees is None:
+        attributes = getattr(to_solve, "__dict__", None)
+        if attributes is None:
+            return PathTrees(to_solve)
+        # setdefault makes sure that two threads getting here at once end up sharing one cache
+        trees = attributes.setdefault("_path_trees", PathTrees(to_solve))
+    return trees
+
+
+def shortest_path_tree(to_solve, source=None, weighted=True):
+    """Returns the shortest-path tree from position 'source' (the start, if None) on 'to_solve', from its cache"""
+    return path_trees(to_solve).get(source, weighted)
+
+
+def find_path(to_solve, target, source=None, weighted=True):
+    """Returns the shortest path from position 'source' (the start, if None) to position 'target' as a deque of
+    positions, or None if there is no path. Only the first query from a source searches the maze; every query after
+    that just follows the cached tree"""
+    return shortest_path_tree(to_solve, source, weighted).path_to(target)
+
+
+def build_tree(to_solve, source, weighted=True):
+    """Builds the shortest-path tree from the node 'source' on 'to_solve', without looking in the cache"""
+    if isinstance(to_solve, CompactMaze):
+        return _build_compact_tree(to_solve, source, weighted)
+
+    # the nodes are numbered in the order we reach them; 'numbers' maps every node reached so far to its number
+    numbers = {source: 0}
+    nodes = [source]
+    parents = array("i", [-1])
+    distances = array("q", [0])
+
+    if weighted:
+        # Dijkstra's algorithm. Rather than decreasing keys, we push a node again whenever we find a shorter path to it,
+        # and skip the stale entries as they come off the heap
+        done = bytearray(1)
+        heap = [(0, 0)]
+        while heap:
+            distance, current = heapq.heappop(heap)
+            if done[current]:
+                continue
+            done[current] = 1
+
+            x, y = nodes[current].get_position()
+            for neighbor in nodes[current].neighbors.values():
+                if neighbor is None:
+                    continue
+                neighbor_x, neighbor_y = neighbor.get_position()
+                new_distance = distance + abs(neighbor_x - x) + abs(neighbor_y - y)
+
+                number = numbers.get(neighbor)
+                if number is None:
+                    number = numbers[neighbor] = len(nodes)
+                    nodes.append(neighbor)
+                    parents.append(current)
+                    distances.append(new_distance)
+                    done.append(0)
+                elif new_distance < distances[number]:
+                    parents[number] = current
+                    distances[number] = new_distance
+                else:
+                    continue
+                heapq.heappush(heap, (new_distance, number))
+    else:
+        # breadth-first search; every node is first reached by a path with the fewest nodes
+        queue = deque([0])
+        while queue:
+            current = queue.popleft()
+            for neighbor in nodes[current].neighbors.values():
+                if neighbor is not None and neighbor not in numbers:
+                    numbers[neighbor] = len(nodes)
+                    nodes.append(neighbor)
+                    parents.append(current)
+                    distances.append(distances[current] + 1)
+                    queue.append(numbers[neighbor])
+
+    # only the nodes we reached are in the tree, so any other position has no path
+    index = {node.get_position(): number for node, number in numbers.items()}
+    positions = [node.get_position() for node in nodes]
+    return PathTree(source.get_position(), parents, distances, index.get, positions.__getitem__)
+
+
+def _build_compact_tree(to_solve: CompactMaze, source, weighted):
+    """Builds the shortest-path tree over a CompactMaze, numbering the nodes by their ids"""
+    indptr = memoryview(to_solve.indptr)
+    indices = memoryview(to_solve.indices)
+    lengths = memoryview(to_solve.lengths)
+    xs = memoryview(to_solve.xs)
+    ys = memoryview(to_solve.ys)
+
+    num_nodes = to_solve.get_num_nodes()
+    parents = array("i", [-1]) * num_nodes
+    distances = array("q", [-1]) * num_nodes
+    distances[source] = 0
+
+    if weighted:
+        done = bytearray(num_nodes)
+        heap = [(0, source)]
+        while heap:
+            distance, current = heapq.heappop(heap)
+            if done[current]:
+                continue
+            done[current] = 1
+
+            for edge in range(indptr[current], indptr[current + 1]):
+                child = indices[edge]
+                new_distance = distance + lengths[edge]
+                old_distance = distances[child]
+                if old_distance < 0 or new_distance < old_distance:
+                    parents[child] = current
+                    distances[child] = new_distance
+                    heapq.heappush(heap, (new_distance, child))
+    else:
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            for edge in range(indptr[current], indptr[current + 1]):
+                child = indices[edge]
+                if distances[child] < 0:
+                    parents[child] = current
+                    distances[child] = distances[current] + 1
+                    queue.append(child)
+
+    finder = path_trees(to_solve)
+
+    def index(position):
+        try:
+            return finder.find_node(position)
+        except MazeException:
+            return None
+
+    return PathTree(to_solve.get_position(source), parents, distances, index, lambda node: (xs[node], ys[node]))
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+
+    from PIL import Image
+    from maze import Maze, native_image
+
+    def position(text):
+        x, y = text.split(",")
+        return int(x), int(y)
+
+    parser = argparse.ArgumentParser(description="Find the shortest paths from one position of a maze to many others, "
+                                                 "building the shortest-path tree once and answering every query from it")
+    parser.add_argument('-i', '--infile', help="The path to the image containing the maze", required=True)
+    parser.add_argument('-g', '--graph', choices=["object", "compact"], default="object",
+                        help="The graph representation to build")
+    parser.add_argument('--source', help="The position to find paths from, as X,Y; the start, if not given",
+                        type=position, default=None)
+    parser.add_argument('-t', '--targets', help="The positions to find paths to, as X,Y", type=position, nargs="*",
+                        default=[])
+    parser.add_argument('-r', '--random', help="Also find paths to this many nodes chosen at random", type=int,
+                        default=0)
+    parser.add_argument('-u', '--unweighted', action="store_true",
+                        help="Find the paths with the fewest nodes (by BFS) rather than the shortest in pixels")
+    parser.add_argument('--seed', help="The seed for choosing random targets", type=int, default=0)
+    args = parser.parse_args()
+
+    maze_image = native_image(Image.open(args.infile))
+    to_solve = CompactMaze(maze_image) if args.graph == "compact" else Maze(maze_image)
+
+    t0 = time.perf_counter()
+    tree = shortest_path_tree(to_solve, args.source, not args.unweighted)
+    t1 = time.perf_counter()
+    print("Built the shortest-path tree from", tree.source, "in", round(t1 - t0, 3), "seconds")
+
+    targets = list(args.targets)
+    if args.random:
+        rng = random.Random(args.seed)
+        reached = [tree.position(node) for node in range(len(tree.distances)) if tree.distances[node] >= 0]
+        targets += [reached[rng.randrange(len(reached))] for _ in range(args.random)]
+
+    t0 = time.perf_counter()
+    paths = [find_path(to_solve, target, args.source, not args.unweighted) for target in targets]
+    t1 = time.perf_counter()
+
+    for target, path in zip(targets[:20], paths):
+        if path is None:
+            print(" ", target, "can't be reached")
+        else:
+            print(" ", target, "is", tree.distance_to(target), "away, along a path of", len(path), "nodes")
+    if len(targets) > 20:
+        print("  ...")
+    if targets:
+        print("Answered", len(targets), "queries in", round(t1 - t0, 3), "seconds ({:.1f} us per query)".format(
+            (t1 - t0) / len(targets) * 1e6))
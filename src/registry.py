@@ -0,0 +1,63 @@
+# pymaze
+# Every solver by its command-line name; a solver's module is only imported once the solver is first used
+
+from collections import namedtuple
+from importlib import import_module
+import time
+
+# what a solver found: whether the maze was solved, how many nodes were explored, the path as a deque of positions
+# (empty if there is none), and the time the search took, in seconds
+Result = namedtuple("Result", ("solved", "explored", "path", "seconds"))
+
+
+class Solver:
+    """A solving algorithm: 'label' is the short name we print for it and 'description' the longer one, and the
+    function that runs it is 'function' in the module 'module'. The module isn't imported until the function is first
+    needed, so a run only pays for importing the solvers it uses. A solver with 'any_opening' finds a path from any
+    entrance of the maze to any exit, rather than from the start to the end"""
+    def __init__(self, label, description, module, function, any_opening=False):
+        self.label = label
+        self.description = description
+        self.module = module
+        self.function_name = function
+        self.any_opening = any_opening
+        self._function = None
+
+    @property
+    def function(self):
+        """The solving function itself, which takes the maze and, optionally, a stats.Stats, and returns a tuple of
+        (solved, explored count, path); being a module-level function, it can be sent to another process"""
+        if self._function is None:
+            self._function = getattr(import_module(self.module), self.function_name)
+        return self._function
+
+    def solve(self, to_solve, stats=None) -> Result:
+        """Solves 'to_solve' and returns the Result, timing only the search itself"""
+        function = self.function
+        t0 = time.perf_counter()
+        solved, explored_count, path = function(to_solve, stats=stats)
+        return Result(solved, explored_count, path, time.perf_counter() - t0)
+
+
+# the solvers by their command-line names
+SOLVERS = {
+    "bfs": Solver("BFS", "BFS", "breadth_first", "breadth_first_search"),
+    "dfs": Solver("DFS", "DFS", "depth_first", "depth_first_search"),
+    "a*": Solver("A*", "A*", "a_star", "a_star"),
+    "dial": Solver("A* (bucket queue)", "A* with a bucket queue", "a_star", "a_star_buckets"),
+    "wall": Solver("wall", "right-hand wall follow method", "wall_follow", "wall_follower"),
+    "bibfs": Solver("bidirectional BFS", "bidirectional BFS", "bidirectional", "bidirectional_bfs"),
+    "bia*": Solver("bidirectional A*", "bidirectional A*", "bidirectional", "bidirectional_a_star"),
+    "multi-bfs": Solver("multi-source BFS", "multi-source BFS", "multi_source", "multi_source_bfs", any_opening=True),
+    "multi-a*": Solver("multi-source A*", "multi-source A*", "multi_source", "multi_source_a_star",
+                       any_opening=True),
+    "hpa*": Solver("HPA*", "hierarchical A*", "hierarchical", "hpa_star"),
+}
+
+
+def get(name) -> Solver:
+    """Returns the solver called 'name' on the command line"""
+    solver = SOLVERS.get(name)
+    if solver is None:
+        raise Exception("Unknown algorithm: " + str(name))
+    return solver
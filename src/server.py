@@ -0,0 +1,378 @@
+# pymaze
+# A long-running solve server that keeps recently used maze graphs in memory between requests
+
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import ipaddress
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from PIL import Image
+
+from compact import CompactMaze
+from draw_solution import draw_solution
+from file_cache import image_hash
+from maze import Maze, native_image
+import registry
+
+# roughly how much memory each node of a Maze takes, with its position and its dictionary of neighbors, as measured
+# with tracemalloc on the 2,000 and 4,000 pixel mazes in img; a CompactMaze knows its size exactly. A solution takes
+# about this much for each position in its path
+NODE_BYTES = 430
+PATH_BYTES = 120
+
+# how many image files we remember the hash of
+HASH_CACHE_SIZE = 4096
+
+
+def graph_size(graph):
+    """Returns about how many bytes 'graph' takes up in memory, along with the hierarchies hpa* has kept on it. The
+    server drops the image a Maze is built from and never asks a graph for path trees, so this is all a resident maze
+    holds besides its solutions"""
+    size = graph.nbytes if isinstance(graph, CompactMaze) else graph.get_num_nodes() * NODE_BYTES
+    cached = getattr(graph, "_hierarchies", None)
+    if cached is not None:
+        size += cached.nbytes
+    return size
+
+
+class ImageHashes:
+    """The hash of each image file asked for, kept along with the file's size, modification time and inode, so that a
+    file is only read and hashed again once it has been replaced or changed. The 'capacity' most recently used files
+    are remembered"""
+    def __init__(self, capacity=HASH_CACHE_SIZE):
+        self.capacity = capacity
+        self.hashes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        """Returns the hash of the file at 'path', hashing it only if we haven't seen it as it is now"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        version = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        with self.lock:
+            known = self.hashes.get(path)
+            if known is not None and known[0] == version:
+                self.hashes.move_to_end(path)
+                return known[1]
+
+        digest = image_hash(path)
+        with self.lock:
+            self.hashes[path] = (version, digest)
+            self.hashes.move_to_end(path)
+            while len(self.hashes) > self.capacity:
+                self.hashes.popitem(last=False)
+        return digest
+
+
+class MazeStore:
+    """The graphs of the mazes solved recently, keyed by the hash of their image and the kind of graph, and kept in
+    order of use, along with the solution each algorithm found on them. Once they take up more than 'budget' bytes,
+    the least recently used graphs and their solutions are dropped, although the graph just built is always kept.
+    The solvers never modify a graph, so any number of requests may solve the same one at once; the store itself is
+    guarded by a lock, although two requests for the same missing maze at the same time may both build it"""
+    def __init__(self, budget):
+        self.budget = budget
+        # each entry is a list of the graph, its size in bytes (with its solutions), and its solutions by algorithm
+        self.graphs = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hashes = ImageHashes()
+
+    def get(self, key):
+        """Returns the graph stored under 'key', or None"""
+        with self.lock:
+            entry = self.graphs.get(key)
+            if entry is None:
+                return None
+            self.graphs.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, graph):
+        """Stores 'graph' under 'key', then drops the least recently used graphs until the store fits in its budget"""
+        size = graph_size(graph)
+        with self.lock:
+            old = self.graphs.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self.graphs[key] = [graph, size, {}]
+            self.size += size
+            self._evict()
+
+    def get_solution(self, key, algorithm):
+        """Returns the solution 'algorithm' found on the graph stored under 'key', or None"""
+        with self.lock:
+            entry = self.graphs.get(key)
+            return None if entry is None else entry[2].get(algorithm)
+
+    def put_solution(self, key, algorithm, solution):
+        """Stores the solution (a registry.Result) 'algorithm' found on the graph under 'key', as long as that graph
+        is still in the store. Solving may have left a hierarchy on the graph, so its size is measured again"""
+        with self.lock:
+            entry = self.graphs.get(key)
+            if entry is None or algorithm in entry[2]:
+                return
+            graph, solutions = entry[0], list(entry[2].values())
+        # measuring the hierarchies walks all their edges, so it is done outside the lock
+        size = graph_size(graph) + sum(len(found.path) for found in solutions + [solution]) * PATH_BYTES
+        with self.lock:
+            if self.graphs.get(key) is not entry or algorithm in entry[2]:
+                return
+            entry[2][algorithm] = solution
+            self.size += size - entry[1]
+            entry[1] = size
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.budget and len(self.graphs) > 1:
+            _, (_, dropped, _) = self.graphs.popitem(last=False)
+            self.size -= dropped
+
+    def status(self):
+        """Returns a description of the graphs in the store, least recently used first"""
+        with self.lock:
+            return {
+                "budget": self.budget,
+                "size": self.size,
+                "mazes": [{"key": key, "nodes": graph.get_num_nodes(), "size": size, "solved_by": list(solutions)}
+                          for key, (graph, size, solutions) in self.graphs.items()],
+            }
+
+
+def inside(directory, path):
+    """Returns the absolute form of 'path', taken relative to 'directory', as long as it lies within 'directory';
+    otherwise raises a ValueError. Symbolic links are followed first, so none can lead out of it"""
+    directory = os.path.realpath(directory)
+    resolved = os.path.realpath(os.path.join(directory, path))
+    if os.path.commonpath([directory, resolved]) != directory:
+        raise ValueError("Not a path within " + directory + ": " + str(path))
+    return resolved
+
+
+def solve(store, request, image_dir=None, output_dir=None):
+    """Solves the maze described by 'request', a dictionary with the path of the image ("image"), and optionally the
+    algorithm ("algorithm", BFS by default), the kind of graph ("graph", "compact" by default), the name of a file to
+    draw the solution to ("outfile"), and whether to send the path back ("path"). Returns a dictionary describing the
+    result, with the same fields as batch.py writes, whether the graph was already in memory ("resident"), and whether
+    the maze had already been solved with this algorithm ("memoized").
+    If 'image_dir' is given, the image must lie within it, and a relative path is taken from it. Solutions are only
+    drawn if 'output_dir' is given, and the outfile must lie within it, so a client can never choose where the server
+    writes"""
+    image_path = request["image"]
+    algorithm = request.get("algorithm", "bfs")
+    graph = request.get("graph", "compact")
+    solver = registry.get(algorithm)
+    if graph not in ("object", "compact"):
+        raise ValueError("Unknown kind of graph: " + str(graph))
+    if image_dir is not None:
+        image_path = inside(image_dir, image_path)
+
+    outfile = request.get("outfile")
+    if outfile is not None:
+        if output_dir is None:
+            raise ValueError("This server doesn't draw solutions; start it with --outdir to allow \"outfile\"")
+        outfile = inside(output_dir, outfile)
+
+    result = {"image": image_path, "algorithm": algorithm}
+    timings = result["timings"] = {}
+
+    # an image file is hashed the first time it is asked for, and again whenever it has changed since, so a maze
+    # whose file has changed is built again
+    t0 = time.perf_counter()
+    key = store.hashes.get(image_path) + "-" + graph
+    to_solve = store.get(key)
+    t1 = time.perf_counter()
+    timings["lookup"] = t1 - t0
+    result["resident"] = to_solve is not None
+
+    maze_image = None
+    if to_solve is None:
+        maze_image = native_image(Image.open(image_path))
+        maze_image.load()
+        t2 = time.perf_counter()
+        timings["load"] = t2 - t1
+
+        to_solve = CompactMaze(maze_image) if graph == "compact" else Maze(maze_image)
+        if graph == "object":
+            # a Maze keeps the image it was built from, which can be larger than the graph itself; the solvers never
+            # look at it, and drawing a solution opens the image again, so a resident maze doesn't need it
+            to_solve.maze_file = None
+        store.put(key, to_solve)
+        t1 = time.perf_counter()
+        timings["build"] = t1 - t2
+
+    # a resident maze remembers what every algorithm found on it, so it is only searched once by each
+    solution = store.get_solution(key, algorithm)
+    result["memoized"] = solution is not None
+    if solution is None:
+        solution = solver.solve(to_solve)
+        store.put_solution(key, algorithm, solution)
+    solved, explored_count, path, _ = solution
+    t3 = time.perf_counter()
+    timings["solve"] = t3 - t1
+
+    result["nodes"] = to_solve.get_num_nodes()
+    result["solved"] = solved
+    result["explored"] = explored_count
+    result["path_nodes"] = len(path)
+    if solved:
+        result["path_length"] = sum(abs(b[0] - a[0]) + abs(b[1] - a[1]) for a, b in zip(path, list(path)[1:]))
+        if request.get("path"):
+            result["path"] = [list(position) for position in path]
+
+        # the image isn't kept in memory, so drawing a solution for a resident maze opens it again
+        if outfile is not None:
+            if maze_image is None:
+                maze_image = Image.open(image_path)
+            solution_image, _ = draw_solution(maze_image.convert("RGB"), path)
+            solution_image.save(outfile)
+            timings["draw"] = time.perf_counter() - t3
+            result["outfile"] = outfile
+
+    return result
+
+
+class SolveHandler(BaseHTTPRequestHandler):
+    """Answers 'POST /solve', whose body is a JSON request for 'solve', and 'GET /status', which describes the mazes
+    in memory. Every response is JSON"""
+
+    def do_GET(self):
+        if self.path != "/status":
+            self.respond(404, {"error": "Not found: " + self.path})
+            return
+        self.respond(200, self.server.store.status())
+
+    def do_POST(self):
+        if self.path != "/solve":
+            self.respond(404, {"error": "Not found: " + self.path})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if not isinstance(request, dict) or "image" not in request:
+                raise ValueError("The request must be a JSON object giving the path of an \"image\"")
+        except ValueError as e:
+            self.respond(400, {"error": str(e)})
+            return
+
+        # errors in the maze itself, or in reading the image, are reported back just as batch.py reports them
+        try:
+            result = solve(self.server.store, request, self.server.image_dir, self.server.output_dir)
+        except Exception as e:
+            self.respond(400, {"image": request["image"], "error": str(e)})
+            return
+        self.respond(200, result)
+
+    def respond(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # clients of a Unix socket have no address
+        return self.client_address[0] if self.client_address else "local"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class SolveServer(ThreadingHTTPServer):
+    """An HTTP server on a local TCP port that answers solve requests from the mazes in 'store'. Images are only read
+    from within 'image_dir', if it is given, and solutions only drawn within 'output_dir'; see solve"""
+    daemon_threads = True
+
+    def __init__(self, address, store, verbose=False, image_dir=None, output_dir=None):
+        self.store = store
+        self.verbose = verbose
+        self.image_dir = image_dir
+        self.output_dir = output_dir
+        super().__init__(address, SolveHandler)
+
+
+class UnixSolveServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """The same server on a Unix socket, which only processes on this machine that may open the socket can reach"""
+    daemon_threads = True
+
+    def __init__(self, path, store, verbose=False, image_dir=None, output_dir=None):
+        self.store = store
+        self.verbose = verbose
+        self.image_dir = image_dir
+        self.output_dir = output_dir
+        super().__init__(path, SolveHandler)
+
+
+def is_loopback(host):
+    """Returns whether every address 'host' stands for is a loopback address, so that only this machine can reach a
+    server listening on it"""
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)}
+    except socket.gaierror:
+        return False
+    return bool(addresses) and all(ipaddress.ip_address(address.split("%")[0]).is_loopback for address in addresses)
+
+
+def _socket_in_use(path):
+    """Returns whether a server is listening on the Unix socket at 'path'"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local server that solves mazes, keeping the graphs of recently "
+                                                 "solved mazes in memory so that solving them again takes milliseconds")
+    parser.add_argument('--host', help="The address to listen on, which must be a loopback address",
+                        default="127.0.0.1")
+    parser.add_argument('--port', help="The port to listen on", type=int, default=8642)
+    parser.add_argument('--socket', help="Listen on a Unix socket at this path instead of a TCP port", default=None)
+    parser.add_argument('-m', '--memory', help="The most memory the resident graphs may use, in MiB; the least "
+                                               "recently used graphs are dropped beyond that", type=int, default=1024)
+    parser.add_argument('--images', help="Only read images from within this directory, taking relative paths from it",
+                        default=None)
+    parser.add_argument('--outdir', help="Draw solutions into this directory when a request gives an \"outfile\"; "
+                                         "without it, no solutions are drawn", default=None)
+    parser.add_argument('-v', '--verbose', action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    # the server reads and writes files with our permissions on behalf of whoever connects, so it only listens where
+    # nothing but this machine can reach it
+    if args.socket is None and not is_loopback(args.host):
+        parser.error("--host must be a loopback address, such as 127.0.0.1 or localhost, not " + args.host)
+    if args.outdir is not None:
+        os.makedirs(args.outdir, exist_ok=True)
+
+    maze_store = MazeStore(args.memory * 2 ** 20)
+    if args.socket is not None:
+        # a socket left behind by a server that didn't shut down cleanly would stop us from binding
+        if os.path.exists(args.socket) and not _socket_in_use(args.socket):
+            os.remove(args.socket)
+        server = UnixSolveServer(args.socket, maze_store, args.verbose, args.images, args.outdir)
+        print("Listening on", args.socket)
+    else:
+        server = SolveServer((args.host, args.port), maze_store, args.verbose, args.images, args.outdir)
+        print("Listening on http://{}:{}".format(args.host, server.server_port))
+
+    # shut down cleanly when terminated, as well as on ^C, so that the socket is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket is not None:
+            os.remove(args.socket)
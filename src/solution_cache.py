@@ -0,0 +1,70 @@
+# pymaze
+# A persistent cache of solutions, so that a maze that has been solved before is never built or searched again
+
+import json
+import os
+import tempfile
+from collections import deque
+
+from file_cache import FileCache
+
+# bump this whenever the format of a record, or the paths the solvers find, change
+VERSION = 1
+
+
+def solution_key(image_key, algorithm, fill=False):
+    """Returns the key of the solution found by 'algorithm' for the image whose hash is 'image_key'. Paths found on a
+    filled-in maze have fewer nodes, so they are kept apart from the others"""
+    return image_key + "-" + algorithm.replace("*", "star") + ("-filled" if fill else "")
+
+
+class SolutionCache(FileCache):
+    """A directory of cached solutions, one small JSON file for each image and algorithm. Each holds whether the maze
+    was solved, how many nodes were explored, the path, and the number of nodes and the time the graph took to build
+    and the maze to solve when it was first solved. When the files take up more than 'max_bytes', the least recently
+    used ones are removed"""
+
+    SUFFIX = ".solution"
+
+    def load(self, key):
+        """Returns the cached solution for 'key' as a dictionary, with the path as a deque of positions, or None if
+        it isn't in the cache"""
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                record = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if record.get("version") != VERSION:
+            return None
+
+        # the positions are stored as one flat list of coordinates
+        coordinates = record["path"]
+        record["path"] = deque(zip(coordinates[::2], coordinates[1::2]))
+
+        # mark the file as recently used; the modification time is what eviction goes by
+        os.utime(path)
+        return record
+
+    def store(self, key, solved, explored_count, path, nodes, build_time, solve_time):
+        """Adds a solution to the cache under 'key', then evicts old solutions until the cache fits in its size bound.
+        The file is written under a temporary name and then renamed, so readers never see a partly-written record"""
+        record = json.dumps({
+            "version": VERSION,
+            "solved": solved,
+            "explored": explored_count,
+            "path": [int(coordinate) for position in path for coordinate in position],
+            "nodes": nodes,
+            "build_time": build_time,
+            "solve_time": solve_time,
+        })
+
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w") as file:
+                file.write(record)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self.evict()
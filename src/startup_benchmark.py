@@ -0,0 +1,80 @@
+# pymaze
+# Startup benchmark: time short runs of pymaze.py from a cold interpreter, where imports dominate
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# the images the cases solve, relative to the repository
+IMAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "img")
+
+
+def cases(output, cache):
+    """Returns the short jobs we time, by name, as the arguments to pass to pymaze.py. 'output' is where solutions are
+    drawn, and 'cache' a solution cache directory"""
+    tiny = os.path.join(IMAGES, "tiny.png")
+    small = os.path.join(IMAGES, "small.png")
+    normal = os.path.join(IMAGES, "normal.png")
+    return {
+        "help": ["-h"],
+        "tiny bfs": ["-i", tiny, "-n"],
+        "small a*, drawn": ["-i", small, "-a", "a*", "-o", output],
+        "small dfs, lazy": ["-i", small, "-a", "dfs", "-g", "lazy", "-n"],
+        "small bibfs, compact": ["-i", small, "-a", "bibfs", "-g", "compact", "-n"],
+        "cached solution": ["-i", normal, "--solution-cache", cache, "-n"],
+    }
+
+
+def time_run(python, script, arguments):
+    """Runs pymaze.py once and returns how long it took, from starting the interpreter until it exited"""
+    t0 = time.perf_counter()
+    subprocess.run([python, script] + arguments, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - t0
+
+
+def main(argv):
+    script = os.path.join(argv.src, "pymaze.py")
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        jobs = cases(os.path.join(directory, "solution.png"), os.path.join(directory, "cache"))
+        for name, arguments in jobs.items():
+            # one run first, to warm the disk cache and to fill the solution cache
+            time_run(argv.python, script, arguments)
+            times = [time_run(argv.python, script, arguments) for _ in range(argv.repeat)]
+            results[name] = {"best": min(times), "median": statistics.median(times)}
+            print("{:<24} best {:7.1f} ms   median {:7.1f} ms".format(name, min(times) * 1000,
+                                                                       statistics.median(times) * 1000))
+
+    if argv.output is not None:
+        with open(argv.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if argv.baseline is not None:
+        with open(argv.baseline) as file:
+            baseline = json.load(file)
+        print()
+        print("Against", argv.baseline + ":")
+        for name, result in results.items():
+            if name in baseline:
+                before, after = baseline[name]["median"], result["median"]
+                print("{:<24} {:7.1f} -> {:7.1f} ms ({:+.0f}%)".format(name, before * 1000, after * 1000,
+                                                                         (after / before - 1) * 100))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time short runs of pymaze.py, each in a new interpreter, to see how "
+                                                 "much of them goes on starting up")
+    parser.add_argument('-r', '--repeat', help="How many times to run each job; the best and median times are shown",
+                        type=int, default=10)
+    parser.add_argument('--src', help="The directory holding the pymaze.py to time; use another checkout's to compare",
+                        default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--python', help="The Python interpreter to run it with", default=sys.executable)
+    parser.add_argument('-o', '--output', help="Write the median and best times to this file as JSON", default=None)
+    parser.add_argument('-b', '--baseline', help="Compare the median times with this earlier output", default=None)
+    sys.exit(main(parser.parse_args()))
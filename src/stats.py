@@ -0,0 +1,69 @@
+# pymaze
+# Instrumentation: time each phase of a run, collect counters from the solvers, and write it all out as JSON
+
+from contextlib import contextmanager, nullcontext
+import json
+import time
+import tracemalloc
+
+
+class Stats:
+    """Collects the time taken by each phase of a run, along with counters recorded by whatever runs during it -- the
+    solvers count the nodes they expand, the operations on their queues, and so on -- and, if 'trace_memory' is set,
+    the peak memory allocated during each phase. Tracing memory slows Python down considerably, so the timings taken
+    alongside it are much less meaningful.
+    Nothing is recorded unless a Stats is passed in: solvers take stats=None, and only look at it once they are done"""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.counters = {}
+        self.current = None
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """Times the body of a with statement as the phase 'name'. A phase that runs more than once adds up its time"""
+        record = self.phases.setdefault(name, {"seconds": 0.0, "counters": {}})
+        outer, self.current = self.current, record
+
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            record["seconds"] += time.perf_counter() - t0
+            if self.trace_memory:
+                record["peak_memory"] = max(record.get("peak_memory", 0), tracemalloc.get_traced_memory()[1])
+            self.current = outer
+
+    def count(self, name, value=1):
+        """Adds 'value' to the counter 'name' of the current phase, or of the run as a whole if no phase is running"""
+        counters = self.counters if self.current is None else self.current["counters"]
+        counters[name] = counters.get(name, 0) + value
+
+    def as_dict(self):
+        return {
+            "total_seconds": time.perf_counter() - self.started,
+            "phases": self.phases,
+            "counters": self.counters,
+        }
+
+    def write(self, output):
+        """Writes the statistics as JSON to 'output', which is either the path of a file or a file already open, such
+        as sys.stdout"""
+        if isinstance(output, str):
+            with open(output, "w") as file:
+                json.dump(self.as_dict(), file, indent=2)
+        else:
+            json.dump(self.as_dict(), output, indent=2)
+            output.write("\n")
+
+
+def phase(stats, name):
+    """Returns stats.phase(name), or a context that does nothing if 'stats' is None"""
+    return nullcontext() if stats is None else stats.phase(name)
@@ -0,0 +1,240 @@
+# pymaze
+# Build the maze graph from a stream of rows, so only a few rows of the image need to be in memory at once
+
+import numpy as np
+
+from compact import CompactMaze
+from grid import GridScan, openings
+from maze import Maze, MazeException
+
+# how many rows we read or convert at a time
+BAND_HEIGHT = 256
+
+
+def _classify(row):
+    """Returns the 'white' and 'invalid' flags for a row of RGB or grayscale pixels"""
+    if row.ndim == 1:
+        white = row == 255
+        black = row == 0
+    else:
+        white = np.all(row == 255, axis=1)
+        black = np.all(row == 0, axis=1)
+    return white, ~(white | black)
+
+
+def _first(mask, lo=0, hi=None):
+    """Returns the first True index in mask[lo:hi], or None"""
+    hits = np.flatnonzero(mask[lo:hi])
+    return None if len(hits) == 0 else lo + int(hits[0])
+
+
+def _invalid_pixel(row, x, y, closing=")"):
+    pixel = (int(row[x]),) * 3 if row.ndim == 1 else tuple(int(v) for v in row[x])
+    message = "BMP image must be black and white (RGB values were " + str(pixel)
+    return MazeException(message + closing, (x, y))
+
+
+def scan_rows(rows, width, height):
+    """Scans a maze given as an iterator over its rows, each an array of RGB pixels of shape (width, 3) or of grayscale
+    pixels of shape (width,), and returns a
+    grid.GridScan. This finds the same nodes and links, and raises the same errors, as the scan in Maze; like that
+    scan, it only ever looks at three rows at a time. 'top' plays the part of Maze's 'top_nodes', holding for every
+    column the id of the node that the next node down will link to, or -1"""
+    rows = iter(rows)
+
+    # the top row holds the start node
+    previous = next(rows)
+    previous_white, previous_invalid = _classify(previous)
+    start_x = _first(previous_white, 1, width - 1)
+    bad_x = _first(previous_invalid, 1, width - 1 if start_x is None else start_x)
+    if bad_x is not None:
+        raise _invalid_pixel(previous, bad_x, 0)
+    if start_x is None:
+        raise Exception("There must be a start point in the top row of the image.")
+
+    current = next(rows)
+    current_white, current_invalid = _classify(current)
+
+    # the other openings in the top row with path below them are entrances; they come straight after the start
+    entrance_xs = np.concatenate(([start_x], openings(previous_white, current_white, start_x)
+                                              if height > 2 else [])).astype(np.intp)
+    top = np.full(width, -1, dtype=np.int64)
+    top[entrance_xs] = np.arange(len(entrance_xs))
+    count = len(entrance_xs)
+
+    xs = [entrance_xs.astype(np.int32)]
+    ys = [np.zeros(count, dtype=np.int32)]
+    west_links, east_links, north_links, south_links = [], [], [], []
+
+    for y in range(1, height - 1):
+        following = next(rows)
+        following_white, following_invalid = _classify(following)
+
+        # find the nodes in this row, just as grid.scan does for the whole image; pixels past the edges count as black
+        east = np.zeros_like(current_white)
+        east[:-1] = current_white[1:]
+        west = np.zeros_like(current_white)
+        west[1:] = current_white[:-1]
+        vertical_tunnel = previous_white & following_white & ~(east | west)
+        horizontal_tunnel = east & west & ~(previous_white | following_white)
+        node_xs = np.flatnonzero(current_white & ~vertical_tunnel & ~horizontal_tunnel)
+        ids = np.arange(count, count + len(node_xs))
+
+        has_west = west[node_xs]
+        has_north = previous_white[node_xs]
+        has_south = following_white[node_xs]
+
+        # a node with path to its west links to the node before it in the row; the first node in a row has nothing
+        # to link to. A node with path to its north links to the node in 'top'
+        west_errors = has_west.copy()
+        west_errors[1:] = False
+        above = top[node_xs]
+        north_errors = has_north & (above < 0)
+
+        # report whichever problem comes first in the row, exactly as the pixel-by-pixel scan would
+        candidates = []
+        bad_x = _first(current_invalid)
+        if bad_x is not None:
+            candidates.append(((bad_x, 0), _invalid_pixel(current, bad_x, y, "")))
+        if west_errors.any():
+            x = int(node_xs[0])
+            candidates.append(((x, 0), MazeException("Expected node to the west; could not find one!", (x, y))))
+        if north_errors.any():
+            x = int(node_xs[np.argmax(north_errors)])
+            candidates.append(((x, 1), MazeException("Expected node to the north; could not find one!", (x, y))))
+        if candidates:
+            raise min(candidates, key=lambda c: c[0])[1]
+
+        xs.append(node_xs.astype(np.int32))
+        ys.append(np.full(len(node_xs), y, dtype=np.int32))
+
+        linked_west = np.flatnonzero(has_west)
+        west_links.append(ids[linked_west - 1])
+        east_links.append(ids[linked_west])
+        north_links.append(above[has_north])
+        south_links.append(ids[has_north])
+
+        # black pixels break the path to the next row; nodes with path to their south become its northern neighbors
+        top[~current_white] = -1
+        top[node_xs[has_south]] = ids[has_south]
+        count += len(node_xs)
+
+        previous, previous_white = current, current_white
+        current, current_white, current_invalid = following, following_white, following_invalid
+
+    # the bottom row holds the end node
+    end_x = _first(current_white, 1, width - 1)
+    bad_x = _first(current_invalid, 1, width - 1 if end_x is None else end_x)
+    if bad_x is not None:
+        raise _invalid_pixel(current, bad_x, height - 1)
+    if end_x is None:
+        raise Exception("There must be an endpoint on the bottom line of the image.")
+    if top[end_x] < 0:
+        raise MazeException("No node found north of end position", (end_x, height - 1))
+
+    # and any other openings in it with path above them are exits
+    exit_xs = np.concatenate(([end_x], openings(current_white, previous_white, end_x)
+                                          if height > 2 else [])).astype(np.intp)
+    xs.append(exit_xs.astype(np.int32))
+    ys.append(np.full(len(exit_xs), height - 1, dtype=np.int32))
+    north_links.append(top[exit_xs])
+    south_links.append(np.arange(count, count + len(exit_xs)))
+
+    def join(chunks):
+        return np.concatenate(chunks).astype(np.intp) if chunks else np.empty(0, dtype=np.intp)
+
+    return GridScan(width, height, join(xs), join(ys), (join(west_links), join(east_links)),
+                    (join(north_links), join(south_links)), np.arange(len(entrance_xs)),
+                    np.arange(count, count + len(exit_xs)))
+
+
+def image_rows(image, band_height=BAND_HEIGHT):
+    """Yields the rows of a PIL image as arrays, converting one band of rows at a time rather than the whole image: to
+    grayscale for 1-bit and grayscale images, which is one byte per pixel, and to RGB for anything else.
+    Note that most formats are still decoded in full by PIL when we first crop them, although in their own mode; for
+    a 1-bit image that is one byte per pixel rather than three"""
+    width, height = image.size
+    mode = "L" if image.mode in ("1", "L") else "RGB"
+    for y0 in range(0, height, band_height):
+        yield from np.asarray(image.crop((0, y0, width, min(y0 + band_height, height))).convert(mode))
+
+
+def _read_netpbm_header(file, fields):
+    """Reads the whitespace-separated header fields of a PBM or PGM file, skipping comments, and leaves the file at the
+    start of the pixel data"""
+    values = []
+    token = b""
+    while len(values) < fields:
+        c = file.read(1)
+        if c == b"#":
+            while c not in (b"\n", b""):
+                c = file.read(1)
+        if c == b"":
+            raise Exception("Unexpected end of file in header")
+        if c.isspace():
+            if token:
+                values.append(token)
+                token = b""
+        else:
+            token += c
+    return values
+
+
+def netpbm_rows(file, width, height, magic, band_height=BAND_HEIGHT):
+    """Yields the rows of a binary PBM (P4) or 8-bit PGM (P5) file as grayscale arrays, reading one band at a time
+    straight from the file, so memory use depends only on the width of the image"""
+    row_bytes = (width + 7) // 8 if magic == b"P4" else width
+    for y0 in range(0, height, band_height):
+        rows = min(band_height, height - y0)
+        data = np.frombuffer(file.read(row_bytes * rows), dtype=np.uint8)
+        if len(data) != row_bytes * rows:
+            raise Exception("Unexpected end of file in pixel data")
+        data = data.reshape(rows, row_bytes)
+
+        if magic == b"P4":
+            # in a PBM, a set bit is black
+            data = np.where(np.unpackbits(data, axis=1)[:, :width], 0, 255).astype(np.uint8)
+
+        yield from data
+
+
+def open_rows(path):
+    """Opens the maze image at 'path' for streaming. Returns (width, height, rows), where 'rows' iterates over the rows
+    of the image as RGB or grayscale arrays. Binary PBM and 8-bit PGM files are read directly from disk; anything else goes through
+    PIL"""
+    with open(path, "rb") as file:
+        magic = file.read(2)
+        if magic in (b"P4", b"P5"):
+            fields = _read_netpbm_header(file, 2 if magic == b"P4" else 3)
+            width, height = int(fields[0]), int(fields[1])
+            if magic == b"P5" and int(fields[2]) != 255:
+                raise Exception("Only 8-bit PGM images can be streamed")
+            offset = file.tell()
+
+            def rows():
+                with open(path, "rb") as data:
+                    data.seek(offset)
+                    yield from netpbm_rows(data, width, height, magic)
+
+            return width, height, rows()
+
+    from PIL import Image
+    image = Image.open(path)
+    width, height = image.size
+
+    def rows():
+        with image:
+            yield from image_rows(image)
+
+    return width, height, rows()
+
+
+def load(path, compact=False):
+    """Builds a Maze (or a CompactMaze, if 'compact' is set) from the image at 'path' without ever holding the whole
+    image in memory as RGB"""
+    width, height, rows = open_rows(path)
+    if height < 2:
+        raise Exception("There must be an endpoint on the bottom line of the image.")
+
+    result = scan_rows(rows, width, height)
+    return CompactMaze.from_scan(result) if compact else Maze.from_scan(result)
@@ -1,44 +1,20 @@
 # pymaze
-# Solve the maze by the right-hand rule
+# Solve the maze by the right-hand rule, falling back on Trémaux's algorithm if that goes round in circles
 
 from collections import deque
-from enum import Enum
+import compact
 import maze
 
+# the compass, clockwise from north; a direction is an index into this, so turning right adds one and turning around
+# adds two. Maze and CompactMaze each have their own directions, which we look up by these indices
+CLOCKWISE = [maze.Direction.NORTH, maze.Direction.EAST, maze.Direction.SOUTH, maze.Direction.WEST]
+NORTH, EAST, SOUTH, WEST = range(4)
 
-def get_next_direction(current_direction: maze.Direction, node: maze.Node) -> maze.Direction:
-    """ Gets the next direction we can move
-    """
-
-    dirs = [maze.Direction.NORTH, maze.Direction.EAST, maze.Direction.SOUTH, maze.Direction.WEST]
-    to_return = current_direction
-    
-    try:
-        # Start with the node to the right of where we are,
-        # walk backwards through the list to find the correct one
-        idx: int = dirs.index(current_direction)
-        if idx == 3:
-            idx = 0
-        else:
-            idx += 1
-        
-        to_return = None
-        while to_return is None:
-            to_test = dirs[idx]
-            if node.has_neighbor(to_test):
-                to_return = to_test
-            else:
-                idx -= 1
-                if idx == -1:
-                    idx = 3
-    except ValueError:
-        print("Invalid direction")
-    
-    return to_return
-    
+# the turns we try at each node, in order: right, straight on, left, and finally back the way we came
+TURNS = (1, 0, 3, 2)
 
 
-def wall_follower(to_solve: maze.Maze) -> list:
+def wall_follower(to_solve: maze.Maze, stats=None, max_steps=None) -> list:
     """ Solves the maze with the right-hand rule
 
     The algorithm is pretty simple:
@@ -49,51 +25,181 @@ def wall_follower(to_solve: maze.Maze) -> list:
     Which direction we are facing will also be tracked (N, S, W, E)
     This means we will always try to go clockwise around the compass if we can, and only go in other directions when it's the only option.
 
+    Where we go next depends only on the node we are at and the direction we are facing, so if we are ever at the same
+    node facing the same way twice, we are going round in a loop that doesn't pass the end -- which happens when the
+    end can't be reached by keeping to the wall we started on. We keep a bit for each node and direction to notice
+    this, and when it happens, we start again from the start with Trémaux's algorithm, which marks each passage as it
+    goes and so is sure to finish, having walked down each passage at most twice.
+
         :param maze:
             The maze object containing the maze to solve
-        
+
+        :param stats:
+            If given, a stats.Stats to add the number of steps taken, and how many of them revisited a node, to
+
+        :param max_steps:
+            The most steps to take before giving up. Between them, the two methods never need more than about eight
+            steps for each node; by default, we allow ten
+
         :returns:
             A tuple containing:
                 * Whether the maze was completed (bool)
-                * The number of nodes in the path (int)
-                * The solution path (deque containing nodes)
+                * The number of steps taken (int)
+                * The solution path (deque of positions); the walk the right-hand rule took if it reached the end,
+                  the path Trémaux's algorithm found if it had to be used, or empty if the end wasn't reached
     """
 
-    # get the start, end nodes
-    start_node = to_solve.get_start()
-    end_node = to_solve.get_end()
-    current_node = start_node
+    if isinstance(to_solve, compact.CompactMaze):
+        return _wall_follower_compact(to_solve, stats, max_steps)
+
+    north, east, south, west = CLOCKWISE
+
+    def exits(node):
+        neighbors = node.neighbors
+        return [neighbors[north], neighbors[east], neighbors[south], neighbors[west]]
+
+    return _follow(to_solve.get_start(), to_solve.get_end(), exits, lambda node: node.id, maze.Node.get_position,
+                   to_solve.node_flags, stats, max_steps)
 
-    # get the positions of the start and end
-    start_pos = start_node.get_position()
-    end_pos = end_node.get_position()
+
+def _wall_follower_compact(to_solve: compact.CompactMaze, stats=None, max_steps=None) -> list:
+    """The right-hand rule over a CompactMaze; see wall_follower"""
+    indptr = memoryview(to_solve.indptr)
+    indices = memoryview(to_solve.indices)
+    directions = memoryview(to_solve.directions)
+    xs = memoryview(to_solve.xs)
+    ys = memoryview(to_solve.ys)
+
+    # the index in CLOCKWISE of each of the compact graph's direction codes
+    clockwise = [0] * 4
+    for index, code in enumerate((compact.NORTH, compact.EAST, compact.SOUTH, compact.WEST)):
+        clockwise[code] = index
+
+    def exits(node):
+        neighbors = [None] * 4
+        for edge in range(indptr[node], indptr[node + 1]):
+            neighbors[clockwise[directions[edge]]] = indices[edge]
+        return neighbors
+
+    return _follow(to_solve.get_start(), to_solve.get_end(), exits, lambda node: node,
+                   lambda node: (xs[node], ys[node]), to_solve.node_flags, stats, max_steps)
+
+
+def _follow(start, end, exits, node_id, position, new_flags, stats, max_steps):
+    """Walks from 'start' to 'end' by the right-hand rule, and by Trémaux's algorithm if that loops. The graph is given
+    by three functions: 'exits' returns a node's neighbors in CLOCKWISE order, with None where there is none, 'node_id'
+    its id and 'position' its position. 'new_flags' returns a flag byte for every node, indexed by id"""
+    # a bit for each direction we have arrived at each node facing
+    seen = new_flags()
+    if max_steps is None:
+        max_steps = 10 * len(seen)
 
     # the start direction is south
-    current_direction = maze.Direction.SOUTH
+    current = start
+    heading = SOUTH
+    path = deque([position(start)])
+    steps = 0
+
+    while current != end:
+        if steps == max_steps:
+            return _give_up(stats, steps, False)
+
+        # start with the direction to the right of where we are facing, and turn left until we find a way out
+        neighbors = exits(current)
+        for turn in TURNS:
+            direction = (heading + turn) % 4
+            if neighbors[direction] is not None:
+                break
+        else:
+            return _give_up(stats, steps, False)    # a node with no neighbors at all
+
+        steps += 1
+        heading = direction
+        current = neighbors[direction]
+        path.append(position(current))
+
+        # if we have been here facing this way before, we'll only go round the same loop again
+        bit = 1 << heading
+        node = node_id(current)
+        if seen[node] & bit and current != end:
+            return _tremaux(start, end, exits, node_id, position, new_flags, stats, steps, max_steps)
+        seen[node] |= bit
+
+    if stats is not None:
+        _count_steps(stats, path)
+
+    return True, steps, path
+
+
+def _tremaux(start, end, exits, node_id, position, new_flags, stats, steps, max_steps):
+    """Trémaux's algorithm: we mark each passage every time we walk down it. At a node we haven't been to before, we
+    take a passage we haven't marked, if there is one, preferring them in the same order as the right-hand rule; if we
+    come to a node we have been to before down a new passage, we turn straight back. Otherwise, we go back down the
+    passage we first came in by. No passage is walked down more than twice, and the passages marked once always lead
+    from the start to where we are, so when we reach the end, they are the path. 'steps' have already been taken"""
+    # two bits of marks for each direction out of each node; a passage's marks are kept at both of its ends
+    marks = new_flags()
+
+    # the nodes along the passages marked once, from the start to where we are
+    stack = [start]
+    current = start
+    heading = SOUTH
+    arrived_by_new_passage = False
+
+    while current != end:
+        if steps == max_steps:
+            return _give_up(stats, steps, True)
+
+        node = node_id(current)
+        node_marks = marks[node]
+        back = (heading + 2) % 4
+
+        neighbors = exits(current)
+        if arrived_by_new_passage and node_marks & ~(3 << 2 * back):
+            # we have been here before, by another passage, so go back the way we came
+            direction = back
+        else:
+            # the first unmarked passage, or failing that, the one we first came in by
+            for direction in [(heading + turn) % 4 for turn in TURNS]:
+                if neighbors[direction] is not None and (node_marks >> 2 * direction) & 3 == 0:
+                    break
+            else:
+                direction = next((direction for direction in range(4) if (node_marks >> 2 * direction) & 3 == 1), None)
+                if direction is None:
+                    return _give_up(stats, steps, True)     # we are back at the start with nowhere left to go
+
+        following = neighbors[direction]
+        marks[node] += 1 << 2 * direction
+        marks[node_id(following)] += 1 << 2 * ((direction + 2) % 4)
+
+        # a passage walked down for the first time is on the way forward; the second time, we are going back
+        arrived_by_new_passage = (marks[node] >> 2 * direction) & 3 == 1
+        if arrived_by_new_passage:
+            stack.append(following)
+        else:
+            stack.pop()
 
-    # data we want to return
-    completed = False
-    node_count = 0
-    path = deque([start_pos])
+        steps += 1
+        heading = direction
+        current = following
 
-    # continue until we are done
-    while not completed:
-        # increment the node count
-        node_count += 1
+    if stats is not None:
+        stats.count("steps", steps)
+        stats.count("wall_loops")
 
-        # get the next node based on how we are facing
-        next_direction = get_next_direction(current_direction, current_node)
-        next_node = current_node.neighbors[next_direction]
-        next_pos = next_node.get_position()
+    return True, steps, deque(position(node) for node in stack)
 
-        # create the new node, setting the current node as its parent
-        next_node.parent = current_node
-        current_node = next_node
-        current_direction = next_direction
 
-        path.append(next_pos)
+def _give_up(stats, steps, looped):
+    """What we return when the end wasn't reached, adding what we know to 'stats'"""
+    if stats is not None:
+        stats.count("steps", steps)
+        if looped:
+            stats.count("wall_loops")
+    return False, steps, []
 
-        if next_pos == end_pos:
-            completed = True
 
-    return completed, node_count, path
+def _count_steps(stats, path):
+    """Adds the number of steps in 'path' to 'stats', and how many of them went back to a node already on it"""
+    stats.count("steps", len(path) - 1)
+    stats.count("revisits", len(path) - len(set(path)))